@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost: query count/time, Server-Timing
+    'store.instrumentation.InstrumentationMiddleware',
+    # reads after a write go to the primary
+    'store.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,7 +86,7 @@ WSGI_APPLICATION = 'books.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'books_db',
         'USER': 'books_user',
         'PASSWORD': '123qazaqA',
@@ -88,6 +94,48 @@ DATABASES = {
         'PORT': '',
     }
 }
+# local SQLite database for dev boxes and benchmarks: BOOKS_SQLITE=bench.sqlite3
+if os.environ.get('BOOKS_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.environ['BOOKS_SQLITE'],
+        }
+    }
+
+# catalogue reads go to these aliases, writes and the writer's next reads to default
+BOOKS_READ_REPLICAS = []
+# BOOKS_SQLITE_REPLICA=replica.sqlite3 adds a local stand-in replica
+if os.environ.get('BOOKS_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['BOOKS_SQLITE_REPLICA'],
+    }
+    BOOKS_READ_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['store.routers.ReplicaRouter']
+
+# PostgreSQL connections: a psycopg 3 pool when psycopg_pool is installed, persistent
+# connections otherwise; both are health checked before use, the pool on checkout since
+# Django skips CONN_HEALTH_CHECKS for pooled connections. SQLite connects directly.
+BOOKS_DB_POOL = {
+    'min_size': int(os.environ.get('BOOKS_DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.environ.get('BOOKS_DB_POOL_MAX_SIZE', 10)),
+    # seconds to wait for a free connection
+    'timeout': float(os.environ.get('BOOKS_DB_POOL_TIMEOUT', 10)),
+    # idle connections above min_size are closed after this many seconds
+    'max_idle': float(os.environ.get('BOOKS_DB_POOL_MAX_IDLE', 300)),
+}
+DB_POOL_INSTALLED = find_spec('psycopg') is not None and find_spec('psycopg_pool') is not None
+for database in DATABASES.values():
+    if database['ENGINE'] != 'django.db.backends.postgresql':
+        continue
+    database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_INSTALLED:
+        from psycopg_pool import ConnectionPool
+
+        database.setdefault('OPTIONS', {})['pool'] = dict(BOOKS_DB_POOL, check=ConnectionPool.check_connection)
+    else:
+        database['CONN_MAX_AGE'] = BOOKS_DB_POOL['max_idle']
 
 AUTHENTICATION_BACKENDS = (
 
@@ -136,13 +184,17 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# MessagePack only when the optional msgpack package is installed
+MSGPACK_INSTALLED = find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-    ),
+        # orjson if installed, stock JSONRenderer output otherwise
+        'store.renderers.FastJSONRenderer',
+    ) + (('store.renderers.MessagePackRenderer',) if MSGPACK_INSTALLED else ()),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
-    )
+    ) + (('store.renderers.MessagePackParser',) if MSGPACK_INSTALLED else ()),
 }
 
 SOCIAL_AUTH_POSTGRES_JSONFIELD = True
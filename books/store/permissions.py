@@ -1,11 +1,33 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 
+async def aget_user(request):
+    """
+    request.auser(), for backends without aget_user (social auth) the sync lookup in a thread
+    """
+    try:
+        return await request.auser()
+    except AttributeError:
+        return await sync_to_async(get_user)(request)
+
+
 class IsOwnerOrStaffOrReadOnly(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return bool(
             request.method in SAFE_METHODS or
             request.user and
-            request.user.is_authenticated and (obj.owner == request.user or request.user.is_staff)
+            request.user.is_authenticated and (obj.owner_id == request.user.pk or request.user.is_staff)
         )
+
+    async def ahas_object_permission(self, request, view, obj):
+        """
+        for async views: the user is loaded with auser() and obj.owner is never fetched
+        :param request: django HttpRequest
+        """
+        if request.method in SAFE_METHODS:
+            return True
+        user = await aget_user(request)
+        return bool(user and user.is_authenticated and (obj.owner_id == user.pk or user.is_staff))
@@ -18,19 +18,28 @@ from django.urls import path, include, re_path
 from rest_framework.routers import SimpleRouter
 
 
-from store.views import BookViewSet, auth, UserBookRelationView
+from store import async_views
+from store.views import BookViewSet, auth, UserBookRelationView, MyBookmarksViewSet, MyLikesViewSet
 
 router = SimpleRouter()
 router.register(r'book', viewset=BookViewSet)
 # like
 router.register(r'book_relation', viewset=UserBookRelationView)
+# own bookmarks and likes
+router.register(r'me/bookmarks', viewset=MyBookmarksViewSet, basename='my-bookmarks')
+router.register(r'me/likes', viewset=MyLikesViewSet, basename='my-likes')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     # auth
     re_path('', include('social_django.urls', namespace='social')),
-    path('auth/', auth)
+    path('auth/', auth),
+
+    # native async endpoints, served by books/asgi.py
+    path('async/book/', async_views.book_list, name='async-book-list'),
+    path('async/book/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/book_relation/<int:book>/', async_views.book_relation, name='async-book-relation'),
 ]
 
 urlpatterns += router.urls
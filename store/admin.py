@@ -1,15 +1,90 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.admin import ModelAdmin
+from django.core.paginator import Paginator
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 
+from store.cache import bump_catalogue_version
+from store.counting import approximate_count
+from store.counters import COUNTER_FIELDS, refresh_book_counters
 from store.models import Book, UserBookRelation
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) of a big table is a full scan on every changelist page;
+    above BOOKS_ADMIN_EXACT_COUNT_LIMIT estimated rows the estimate is shown instead
+    """
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list, getattr(settings, 'BOOKS_ADMIN_EXACT_COUNT_LIMIT', 10000))[0]
+
+
+class ScalableAdmin(ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # no second COUNT(*) of the unfiltered table for "N total"
+    show_full_result_count = False
+    ordering = ('-id',)
+
+
 # create decarator
 @admin.register(Book)
-class BookAdmin(ModelAdmin):
-    pass
+class BookAdmin(ScalableAdmin):
+    list_display = ('id', 'name', 'autor_name', 'price', 'owner', 'likes_count', 'rating_avg', 'updated_at')
+    list_select_related = ('owner',)
+    # served by the trigram indexes of store.search on PostgreSQL
+    search_fields = ('name', 'autor_name')
+    raw_id_fields = ('owner',)
+    # maintained by store.signals, recounted by the action below
+    readonly_fields = COUNTER_FIELDS + ('rating_avg', 'rating_weighted', 'updated_at')
+    actions = ('recount',)
+
+    @admin.action(description='Recount likes, bookmarks and ratings')
+    def recount(self, request, queryset):
+        using = router.db_for_write(Book)
+        with transaction.atomic(using=using):
+            updated = refresh_book_counters(queryset.values('pk'))
+        bump_catalogue_version(using)
+        self.message_user(request, f'Recounted {updated} books.', messages.SUCCESS)
 
 
 @admin.register(UserBookRelation)
-class UserBookRelationAdmin(ModelAdmin):
-    pass
+class UserBookRelationAdmin(ScalableAdmin):
+    list_display = ('id', 'user', 'book', 'like', 'in_bookmarks', 'rate', 'updated_at')
+    # __str__ and the user/book columns without two queries per row
+    list_select_related = ('user', 'book')
+    list_filter = ('like', 'in_bookmarks', 'rate')
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('book',)
+    actions = ('mark_liked', 'mark_unliked', 'remove_bookmarks', 'clear_rate')
+
+    def update_relations(self, request, queryset, **values):
+        """
+        one UPDATE of the selected relations, then one recount of their books
+        """
+        using = router.db_for_write(UserBookRelation)
+        with transaction.atomic(using=using):
+            book_ids = list(queryset.order_by().values_list('book_id', flat=True).distinct())
+            updated = queryset.update(updated_at=timezone.now(), **values)
+            refresh_book_counters(book_ids)
+        bump_catalogue_version(using)
+        self.message_user(request, f'Updated {updated} relations of {len(book_ids)} books.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected as liked')
+    def mark_liked(self, request, queryset):
+        self.update_relations(request, queryset, like=True)
+
+    @admin.action(description='Mark selected as not liked')
+    def mark_unliked(self, request, queryset):
+        self.update_relations(request, queryset, like=False)
+
+    @admin.action(description='Remove selected from bookmarks')
+    def remove_bookmarks(self, request, queryset):
+        self.update_relations(request, queryset, in_bookmarks=False)
+
+    @admin.action(description='Clear rating of selected')
+    def clear_rate(self, request, queryset):
+        self.update_relations(request, queryset, rate=None)
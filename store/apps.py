@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_search_index(sender, using, plan=None, **kwargs):
+    from django.db import connections
+
+    from .search import install_search_index
+    if plan and any(migration.app_label == 'store' for migration, _ in plan):
+        install_search_index(connections[using])
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Book counters
+        from . import signals  # noqa: F401
+        # SQLite rebuilds store_book on ALTER and loses the search triggers
+        post_migrate.connect(repair_search_index, sender=self)
@@ -0,0 +1,140 @@
+"""
+Native async versions of the book endpoints, for books/asgi.py.
+
+DRF views are sync only, these are plain Django async views reusing
+BookViewSet's queryset, filters, pagination and serializers.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ParseError, PermissionDenied
+from rest_framework.request import Request
+
+from books.store.permissions import IsOwnerOrStaffOrReadOnly, aget_user
+from .models import Book
+from .relations import RELATION_FIELDS, queue_relation, upsert_relation, write_behind_enabled
+from .renderers import FastJSONRenderer
+from .serializers import BooksSerializer, BookValuesSerializer, UserBookRelationSerializer
+from .views import BookViewSet
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    renderer = FastJSONRenderer()
+    return HttpResponse(renderer.render(data), status=status_code,
+                        content_type=f'{renderer.media_type}; charset={renderer.charset}')
+
+
+def handle_api_errors(func):
+    """
+    APIException -> JSON error response, like DRF's exception handler
+    """
+    @wraps(func)
+    async def view(request, *args, **kwargs):
+        try:
+            return await func(request, *args, **kwargs)
+        except APIException as exc:
+            if isinstance(exc, NotAuthenticated):
+                # session auth has no WWW-Authenticate challenge, DRF answers 403 as well
+                exc.status_code = status.HTTP_403_FORBIDDEN
+            return render({'detail': exc.detail} if not isinstance(exc.detail, (list, dict)) else exc.detail,
+                          exc.status_code)
+    return view
+
+
+def parse_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+
+async def get_book_view(request, action):
+    """
+    BookViewSet configured for `request`, only to build querysets
+    """
+    drf_request = Request(request)
+    # loaded here, DRF authentication would hit the database synchronously
+    drf_request.user = await aget_user(request)
+    return BookViewSet(request=drf_request, action=action, format_kwarg=None, kwargs={})
+
+
+@handle_api_errors
+async def book_list(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    view = await get_book_view(request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+
+    values_serializer = BookValuesSerializer(BooksSerializer(context={'request': view.request}))
+    ordering = [field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)]
+    columns = tuple(dict.fromkeys(values_serializer.columns + tuple(ordering) + ('id',)))
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset.values_list(*columns, named=True), view.request)
+    response = render({
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': values_serializer.to_representation(page),
+    })
+    for header, value in paginator.get_count_headers().items():
+        response[header] = value
+    return response
+
+
+@handle_api_errors
+async def book_detail(request, pk):
+    if request.method not in ('GET', 'PUT', 'PATCH', 'DELETE'):
+        return HttpResponseNotAllowed(['GET', 'PUT', 'PATCH', 'DELETE'])
+    view = await get_book_view(request, 'retrieve')
+    try:
+        book = await view.get_queryset().aget(pk=pk)
+    except Book.DoesNotExist:
+        raise NotFound()
+    if not await IsOwnerOrStaffOrReadOnly().ahas_object_permission(request, view, book):
+        raise PermissionDenied()
+
+    if request.method == 'DELETE':
+        await book.adelete()
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+    if request.method in ('PUT', 'PATCH'):
+        serializer = BooksSerializer(book, data=parse_body(request), partial=request.method == 'PATCH')
+        if not serializer.is_valid():
+            return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        book = await sync_to_async(serializer.save)()
+    return render(BooksSerializer(book, context={'request': view.request}).data)
+
+
+@handle_api_errors
+async def book_relation(request, book):
+    """
+    PATCH/PUT like, in_bookmarks, rate of the current user
+    """
+    if request.method not in ('PUT', 'PATCH'):
+        return HttpResponseNotAllowed(['PUT', 'PATCH'])
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        raise NotAuthenticated()
+    data = parse_body(request)
+    if not isinstance(data, dict):
+        raise ParseError('Expected an object.')
+    # the book comes from the url
+    data.pop('book', None)
+    serializer = UserBookRelationSerializer(data=data, partial=True)
+    if not serializer.is_valid():
+        return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    values = {field: value for field, value in serializer.validated_data.items() if field in RELATION_FIELDS}
+    if write_behind_enabled():
+        try:
+            relation = await sync_to_async(queue_relation)(user, book, values)
+        except Book.DoesNotExist:
+            raise NotFound()
+        return render(UserBookRelationSerializer(relation).data, status.HTTP_202_ACCEPTED)
+    try:
+        # the sync endpoint's upsert, counters move from the locked old state
+        relation = await sync_to_async(upsert_relation)(user, book, values)
+    except Book.DoesNotExist:
+        raise NotFound()
+    return render(UserBookRelationSerializer(relation).data)
@@ -0,0 +1,195 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .instrumentation import record_timing
+from .models import DeletedBook
+from .routers import reads_from_primary
+
+CATALOGUE_VERSION_KEY = 'store:catalogue_version'
+USER_VERSION_KEY = 'store:user_version'
+# moves only when Book rows are added, deleted or edited, not with their counters
+BOOKS_VERSION_KEY = 'store:books_version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BOOKS_RESPONSE_CACHE', 'default')]
+
+
+def _get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # never restart from 1 after an eviction, old entries would come back
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+def get_catalogue_version():
+    return _get_version(CATALOGUE_VERSION_KEY)
+
+
+def _bump_catalogue_version():
+    _bump_version(CATALOGUE_VERSION_KEY)
+
+
+def get_books_version():
+    return _get_version(BOOKS_VERSION_KEY)
+
+
+def _bump_books_version():
+    _bump_version(BOOKS_VERSION_KEY)
+
+
+def get_user_version(user_id):
+    return _get_version(f'{USER_VERSION_KEY}:{user_id}')
+
+
+def bump_user_version(user_id):
+    """
+    invalidate the cached responses of one user, the ones showing their own relations
+    """
+    _bump_version(f'{USER_VERSION_KEY}:{user_id}')
+
+
+def bump_catalogue_version(using=None, books=False):
+    """
+    invalidate every cached book response, and with `books` the cached counts;
+    bumped again on commit, a reader could re-cache old data in between
+    """
+    _bump_catalogue_version()
+    transaction.on_commit(_bump_catalogue_version, using=using)
+    if books:
+        _bump_books_version()
+        transaction.on_commit(_bump_books_version, using=using)
+
+
+class CachedResponseMixin:
+    """
+    Caches rendered list/retrieve responses, keyed on the catalogue version
+    and the normalized request, invalidated by bump_catalogue_version().
+    """
+    cached_actions = ('list', 'retrieve')
+    # replayed from the cache with the content
+    cached_headers = ('X-Total-Count', 'X-Total-Count-Exact')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key_parts(self, request):
+        query = sorted((key, value) for key, values in request.query_params.lists()
+                       for value in values if value != '')
+        # authenticated responses carry the user's own relations
+        user = request.user.pk if request.user.is_authenticated else None
+        # a lagging replica's page must not be served to a writer pinned to the primary
+        primary = reads_from_primary()
+        return [request.get_host(), request.path, query, request.accepted_media_type, user, primary]
+
+    def get_response_cache_key(self, request):
+        parts = [get_catalogue_version()] + self.get_cache_key_parts(request)
+        if request.user.is_authenticated:
+            parts.append(get_user_version(request.user.pk))
+        return 'store:response:v2:' + hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        self.response_cache_key = None
+        if request.method != 'GET' or self.action not in self.cached_actions:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        cached = get_cache().get(key)
+        if cached is not None:
+            content, content_type, headers = cached
+            return HttpResponse(content, content_type=content_type, headers=headers)
+        self.response_cache_key = key
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            with record_timing('render'):
+                response.render()
+            headers = {name: response[name] for name in self.cached_headers if response.has_header(name)}
+            get_cache().set(key, (response.content, response['Content-Type'], headers),
+                            getattr(settings, 'BOOKS_RESPONSE_CACHE_TIMEOUT', 300))
+        return response
+
+
+class ConditionalGetMixin(CachedResponseMixin):
+    """
+    Strong ETag and Last-Modified for list/retrieve/top; a matching If-None-Match
+    or If-Modified-Since gets a 304 before the book queryset is evaluated.
+
+    Validators come from the database only, so every worker agrees on them:
+    Book.updated_at (relation changes touch it through the counters),
+    the newest DeletedBook tombstone, which covers deletes, and
+    get_stamp_subqueries().
+    """
+    conditional_actions = ('list', 'retrieve', 'top')
+
+    def get_stamp_subqueries(self, request):
+        """
+        other change stamps of the response, read in the same query
+        :return: {name: Subquery of one datetime}
+        """
+        return {}
+
+    def get_last_modified(self, request, *args, **kwargs):
+        """
+        :return: (Last-Modified, [stamps hashed into the ETag]), None for a missing book or empty catalogue
+        """
+        books = self.queryset.model.objects.all()
+        subqueries = self.get_stamp_subqueries(request)
+        if self.action == 'retrieve':
+            lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+            books = books.filter(**{self.lookup_field: lookup})
+        else:
+            # deletes do not move Max(updated_at); both ends of an index in one query
+            subqueries['deleted_at'] = Subquery(DeletedBook.objects.order_by('-deleted_at').values('deleted_at')[:1])
+            books = books.order_by('-updated_at')
+        stamps = books.annotate(**subqueries).values_list('updated_at', *subqueries).first()
+        if stamps is None:
+            return None
+        return max(stamp for stamp in stamps if stamp is not None), list(stamps)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.method != 'GET' or self.action not in self.conditional_actions:
+            return super().cached_response(handler, request, *args, **kwargs)
+        try:
+            validators = self.get_last_modified(request, *args, **kwargs)
+        except (TypeError, ValueError):
+            validators = None
+        if validators is None:
+            return super().cached_response(handler, request, *args, **kwargs)
+
+        last_modified, stamps = validators
+        parts = [stamp and stamp.isoformat() for stamp in stamps] + self.get_cache_key_parts(request)
+        etag = quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().cached_response(handler, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+        return response
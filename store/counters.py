@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
+from django.db.models.lookups import GreaterThan
+
+from .models import Book, UserBookRelation
+
+RATES = tuple(rate for rate, _ in UserBookRelation.RATE_CHOICES)
+
+COUNTER_FIELDS = ('likes_count', 'bookmarks_count', 'rating_sum', 'rating_count') + \
+    tuple(f'rate_{rate}_count' for rate in RATES)
+
+
+def relation_counters(like, in_bookmarks, rate):
+    """
+    what one relation adds to the counters of its book
+    :return: {counter field: value}
+    """
+    counters = {}
+    if like:
+        counters['likes_count'] = 1
+    if in_bookmarks:
+        counters['bookmarks_count'] = 1
+    if rate is not None:
+        counters['rating_sum'] = rate
+        counters['rating_count'] = 1
+        counters[f'rate_{rate}_count'] = 1
+    return counters
+
+
+def apply_counter_deltas(deltas):
+    """
+    UPDATE with F() expressions, so concurrent writers do not lose increments;
+    books with the same delta share one statement
+    :param deltas: {book_id: {counter field: delta}}
+    """
+    books = {}
+    for book_id, delta in deltas.items():
+        delta = tuple(sorted((field, value) for field, value in delta.items() if value))
+        if delta:
+            books.setdefault(delta, []).append(book_id)
+    for delta, book_ids in books.items():
+        updates = {field: F(field) + value for field, value in delta}
+        if 'rating_count' in updates or 'rating_sum' in updates:
+            # every SET sees the old row, so the ranking is computed from old value + delta
+            updates.update(rating_expressions(updates.get('rating_sum', F('rating_sum')),
+                                              updates.get('rating_count', F('rating_count'))))
+        Book.objects.filter(pk__in=book_ids).update(updated_at=Now(), **updates)
+
+
+def rating_expressions(rating_sum=None, rating_count=None):
+    """
+    average and Bayesian rating: BOOKS_RATING_PRIOR_WEIGHT votes of BOOKS_RATING_PRIOR_MEAN
+    are added to every book, so a single 5 does not outrank a hundred 4s
+    :return: {'rating_avg': expression, 'rating_weighted': expression}
+    """
+    rating_sum = Cast(rating_sum if rating_sum is not None else F('rating_sum'), FloatField())
+    rating_count = rating_count if rating_count is not None else F('rating_count')
+    mean = float(getattr(settings, 'BOOKS_RATING_PRIOR_MEAN', 3.0))
+    weight = float(getattr(settings, 'BOOKS_RATING_PRIOR_WEIGHT', 10))
+    rated = GreaterThan(rating_count, 0)
+    return {
+        'rating_avg': Case(When(rated, then=rating_sum / Cast(rating_count, FloatField())),
+                           default=Value(0.0), output_field=FloatField()),
+        'rating_weighted': Case(When(rated, then=(Value(weight * mean) + rating_sum) /
+                                     (Value(weight) + Cast(rating_count, FloatField()))),
+                                default=Value(mean), output_field=FloatField()),
+    }
+
+
+def relation_states_changed(changes):
+    """
+    move counters from the old (book_id, like, in_bookmarks, rate) to the new one,
+    any of them can be None for a created/deleted relation
+    :param changes: iterable of (old_state, new_state)
+    """
+    deltas = {}
+    for old_state, new_state in changes:
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            book_id, *values = state
+            delta = deltas.setdefault(book_id, {})
+            for field, value in relation_counters(*values).items():
+                delta[field] = delta.get(field, 0) + sign * value
+    apply_counter_deltas(deltas)
+
+
+def relation_state_changed(old_state, new_state):
+    relation_states_changed([(old_state, new_state)])
+
+
+def counter_expressions():
+    """
+    correlated subqueries that compute every counter from UserBookRelation
+    :return: {counter field: expression}
+    """
+    relations = UserBookRelation.objects.filter(book=OuterRef('pk')).order_by().values('book')
+
+    def aggregate(expression):
+        return Coalesce(Subquery(relations.annotate(value=expression).values('value')),
+                        Value(0), output_field=IntegerField())
+
+    expressions = {
+        'likes_count': aggregate(Count('pk', filter=Q(like=True))),
+        'bookmarks_count': aggregate(Count('pk', filter=Q(in_bookmarks=True))),
+        'rating_sum': aggregate(Sum('rate')),
+        'rating_count': aggregate(Count('rate')),
+    }
+    for rate in RATES:
+        expressions[f'rate_{rate}_count'] = aggregate(Count('pk', filter=Q(rate=rate)))
+    return expressions
+
+
+def refresh_book_counters(book_ids=None):
+    """
+    recompute counters from scratch in a single UPDATE
+    :param book_ids: books to refresh, all books if None
+    :return: number of updated books
+    """
+    books = Book.objects.all()
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+    updated = books.update(updated_at=Now(), **counter_expressions())
+    books.update(**rating_expressions())
+    return updated
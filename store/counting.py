@@ -0,0 +1,68 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.sql.constants import INNER
+
+from .cache import get_books_version, get_cache, get_catalogue_version
+from .models import Book
+
+
+def estimate_count(queryset):
+    """
+    planner row estimate: pg_class.reltuples for a whole table,
+    the top plan node of EXPLAIN for a filtered queryset
+    :return: estimated rows, None when the database has no estimate
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    queryset = queryset.order_by()
+    if not queryset.query.has_filters():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        # -1 for a never analyzed table
+        return row[0] if row and row[0] >= 0 else None
+    plan = json.loads(queryset.explain(format='json'))
+    # Django flattens the [plan] list of psycopg2 to the plan itself
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+def count_cache_key(queryset):
+    query = queryset.order_by().query
+    sql, params = query.sql_with_params()
+    # likes and ratings do not change how many books match, only book edits do
+    parts = [get_books_version(), queryset.db, sql, params]
+    if queryset.model is not Book or \
+            any(getattr(join, 'join_type', None) == INNER for join in query.alias_map.values()):
+        # relations decide the count as well: the relation admin, /me/bookmarks/ joins
+        parts.append(get_catalogue_version())
+    return 'store:count:' + hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def approximate_count(queryset, threshold=None):
+    """
+    exact COUNT(*) below `threshold` (BOOKS_COUNT_ESTIMATE_THRESHOLD) estimated rows,
+    the estimate above it; cached per query until a book changes, at most
+    BOOKS_COUNT_CACHE_TIMEOUT seconds
+    :return: (count, True if exact)
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'BOOKS_COUNT_ESTIMATE_THRESHOLD', 10000)
+    cache = get_cache()
+    key = count_cache_key(queryset)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    estimate = estimate_count(queryset)
+    if estimate is not None and estimate >= threshold:
+        result = (estimate, False)
+    else:
+        result = (queryset.order_by().count(), True)
+    cache.set(key, result, getattr(settings, 'BOOKS_COUNT_CACHE_TIMEOUT', 60))
+    return result
@@ -0,0 +1,44 @@
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+    file-like object for csv.writer that hands the written line back
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(items, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for item in items:
+        yield writer.writerow([item[field] for field in fields])
+
+
+def iter_ndjson(items, fields=None):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for item in items:
+        yield encoder.encode(item) + '\n'
+
+
+EXPORT_WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+def export_lines(items, fields, export_format):
+    """
+    :param items: iterable of representation dicts
+    :return: iterator of CSV/NDJSON lines, one item in memory at a time
+    """
+    return EXPORT_WRITERS[export_format](items, fields)
@@ -0,0 +1,22 @@
+from rest_framework.filters import OrderingFilter
+
+
+class BookOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter with public names for the ranking columns,
+    ?ordering=-rating sorts on the indexed Book.rating_avg instead of the annotation
+    """
+    ordering_aliases = {
+        'rating': 'rating_avg',
+        'weighted_rating': 'rating_weighted',
+        'likes': 'likes_count',
+        'annotated_likes': 'likes_count',
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        aliases = self.ordering_aliases
+        return [f'-{aliases.get(field[1:], field[1:])}' if field.startswith('-') else aliases.get(field, field)
+                for field in ordering]
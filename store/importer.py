@@ -0,0 +1,186 @@
+import codecs
+import csv
+import io
+import json
+
+from django.db import connections, router, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+
+from .cache import bump_catalogue_version
+from .models import Book
+from .serializers import BooksSerializer
+
+IMPORT_FIELDS = ('name', 'price', 'autor_name')
+IMPORT_FORMATS = ('csv', 'jsonl')
+INVALID_ROW = 'Invalid row.'
+INVALID_ENCODING = 'Invalid row, the file is not UTF-8 encoded.'
+
+
+def guess_format(filename):
+    """
+    :return: 'csv' or 'jsonl' from the file extension, None if unknown
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension)
+
+
+def iter_lines(file):
+    """
+    decode a binary file line by line, a bad byte spoils only its own line
+    :return: iterator of (line number, text, False if the line is not UTF-8)
+    """
+    for line_number, line in enumerate(file, 1):
+        if line_number == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        try:
+            yield line_number, line.decode('utf-8'), True
+        except UnicodeDecodeError:
+            # keeps the line breaks and quotes, the row is rejected anyway
+            yield line_number, line.decode('utf-8', 'replace'), False
+
+
+def iter_rows(file, format):
+    """
+    parse a binary file lazily, one row in memory at a time
+    :return: iterator of (line number, row dict or an error message for an unparsable line)
+    """
+    if format == 'csv':
+        yield from iter_csv_rows(file)
+        return
+    for line_number, line, valid in iter_lines(file):
+        if not valid:
+            yield line_number, INVALID_ENCODING
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else INVALID_ROW
+
+
+def iter_csv_rows(file):
+    invalid_lines = set()
+    read = 0
+
+    def lines():
+        nonlocal read
+        for line_number, line, valid in iter_lines(file):
+            if not valid:
+                invalid_lines.add(line_number)
+            read = line_number
+            yield line
+
+    reader = csv.DictReader(lines())
+    last_line = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            # the reader starts over on the next line
+            yield read, f'Invalid CSV: {exc}.'
+            last_line = read
+            continue
+        # a quoted field can span several lines
+        if invalid_lines.intersection(range(last_line + 1, read + 1)):
+            yield read, INVALID_ENCODING
+        else:
+            yield read, row
+        last_line = read
+
+
+class BookImporter:
+    """
+    Validates rows with BooksSerializer's field rules and writes them in
+    batches, COPY on PostgreSQL, bulk_create elsewhere. Invalid rows are
+    reported and skipped, every batch is its own transaction.
+    """
+    max_errors = 1000
+
+    def __init__(self, owner=None, batch_size=1000):
+        self.owner_id = owner.pk if owner is not None else None
+        self.batch_size = batch_size
+        serializer_fields = BooksSerializer().fields
+        self.fields = [(name, serializer_fields[name]) for name in IMPORT_FIELDS]
+        self.using = router.db_for_write(Book)
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        """
+        :param rows: iterable of (line number, row dict or error message)
+        :return: {'created': n, 'error_count': n, 'errors': [{'line': n, 'errors': {...}}, ...]}
+        """
+        batch = []
+        for line_number, row in rows:
+            values = self.validate(line_number, row)
+            if values is None:
+                continue
+            batch.append(values)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+        if self.created:
+            bump_catalogue_version(using=self.using, books=True)
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+    def validate(self, line_number, row):
+        if not isinstance(row, dict):
+            self.add_error(line_number, {'non_field_errors': [row]})
+            return None
+        values, errors = {}, {}
+        for name, field in self.fields:
+            try:
+                values[name] = field.run_validation(row.get(name, empty))
+            except ValidationError as exc:
+                errors[name] = exc.detail
+        if errors:
+            self.add_error(line_number, errors)
+            return None
+        return values
+
+    def add_error(self, line_number, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def write(self, batch):
+        # owner is the same for the whole batch
+        books = [Book(owner_id=self.owner_id, **values) for values in batch]
+        connection = connections[self.using]
+        with transaction.atomic(using=self.using):
+            if connection.vendor == 'postgresql':
+                self.copy(connection, books)
+            else:
+                Book.objects.using(self.using).bulk_create(books)
+        self.created += len(books)
+
+    @staticmethod
+    def copy(connection, books):
+        fields = [field for field in Book._meta.concrete_fields if not field.primary_key]
+        qn = connection.ops.quote_name
+        sql = f'COPY {qn(Book._meta.db_table)} ({", ".join(qn(field.column) for field in fields)}) FROM STDIN'
+        rows = ([field.get_db_prep_save(field.pre_save(book, True), connection) for field in fields]
+                for book in books)
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy'):
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                # psycopg2: unquoted empty is NULL, quoted "" an empty string
+                data = io.StringIO()
+                for row in rows:
+                    data.write(','.join('' if value is None else '"%s"' % str(value).replace('"', '""')
+                                        for value in row) + '\n')
+                data.seek(0)
+                raw.copy_expert(f'{sql} WITH (FORMAT csv)', data)
@@ -0,0 +1,215 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('store.instrumentation')
+
+_metrics = ContextVar('store_request_metrics', default=None)
+# IN (%s, %s, ...) of any length is the same query shape
+_in_list = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class RequestMetrics:
+    """
+    SQL count/time and named timings of one request.
+    SQL run while serializing is counted in both `db` and `serialize`.
+    """
+    __slots__ = ('start', 'queries', 'connects', 'sql_time', 'timings', 'shapes')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        # new unpooled database connections, 0 once a persistent connection is warm
+        self.connects = 0
+        self.sql_time = 0.0
+        self.timings = {}
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook, the sql is parametrized so it is the shape
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[sql] += 1
+
+    def add_timing(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    def repeated_queries(self, threshold):
+        """
+        :return: {sql shape: count} of shapes executed at least threshold times
+        """
+        shapes = Counter()
+        for sql, count in self.shapes.items():
+            shapes[_in_list.sub('IN (...)', sql)] += count
+        return {sql: count for sql, count in shapes.items() if count >= threshold}
+
+
+def count_connect(sender, connection, **kwargs):
+    # sent on every checkout from a pool too; pool_stats()['opened'] counts its real connections
+    if getattr(connection, 'pool', None) is not None:
+        return
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.connects += 1
+
+
+connection_created.connect(count_connect)
+
+
+def pool_stats(using=DEFAULT_DB_ALIAS):
+    """
+    :return: {'mode': 'pool', 'size', 'max_size', 'in_use', 'opened', 'waiting', 'waits', 'wait_ms', 'errors'}
+        for a connection pool, {'mode': 'persistent' or 'direct', 'connected'} otherwise
+    """
+    connection = connections[using]
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        mode = 'persistent' if connection.settings_dict.get('CONN_MAX_AGE') else 'direct'
+        return {'mode': mode, 'connected': connection.connection is not None}
+    stats = pool.get_stats()
+    return {
+        'mode': 'pool',
+        'size': stats.get('pool_size', 0),
+        'max_size': pool.max_size,
+        'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+        # connections opened since start, flat once the pool is warm
+        'opened': stats.get('connections_num', 0),
+        # waiting now, waited since start and total wait
+        'waiting': stats.get('requests_waiting', 0),
+        'waits': stats.get('requests_queued', 0),
+        'wait_ms': stats.get('requests_wait_ms', 0),
+        'errors': stats.get('requests_errors', 0),
+    }
+
+
+@contextmanager
+def record_timing(name):
+    """
+    adds the duration of the block to the current request's `name` timing
+    """
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """
+    times the root serializer's output as `serialize`
+    """
+
+    @property
+    def data(self):
+        with record_timing('serialize'):
+            return super().data
+
+
+class InstrumentationMiddleware:
+    """
+    Records SQL count/time, new connections, serialize and render time per request,
+    sends them as Server-Timing and logs one JSON line on `store.instrumentation`
+    with the connection pool statistics.
+    Query shapes repeated BOOKS_REPEATED_QUERY_THRESHOLD times (an N+1) are logged as a warning.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.repeated_query_threshold = getattr(settings, 'BOOKS_REPEATED_QUERY_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            with self.wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            with self.wrap_connections(metrics):
+                response = await self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    @staticmethod
+    def wrap_connections(metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def process_template_response(self, request, response):
+        # the last template response hook, rendering starts right after it
+        metrics = _metrics.get()
+        if metrics is not None and not response.is_rendered:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.add_timing('render', time.perf_counter() - start)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.start
+        timings = [('db', metrics.sql_time, f'{metrics.queries} queries')]
+        timings += [(name, duration, None) for name, duration in metrics.timings.items()]
+        timings.append(('total', total, None))
+        metrics_header = [f'{name};dur={duration * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+                          for name, duration, desc in timings]
+        if metrics.connects:
+            # a persistent connection needs none once warm, pool checkouts are not counted
+            metrics_header.append(f'connect;desc="{metrics.connects} new"')
+        response['Server-Timing'] = ', '.join(metrics_header)
+
+        repeated = metrics.repeated_queries(self.repeated_query_threshold)
+        if repeated:
+            logger.warning('Repeated queries on %s %s: %s', request.method, request.path,
+                           json.dumps(repeated))
+        if logger.isEnabledFor(logging.INFO):
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'repeated_queries': sum(repeated.values()),
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(metrics.sql_time * 1000, 1),
+                'connects': metrics.connects,
+            }
+            pool = pool_stats()
+            if pool['mode'] == 'pool':
+                record['pool'] = pool
+            record.update((f'{name}_ms', round(duration * 1000, 1)) for name, duration in metrics.timings.items())
+            logger.info(json.dumps(record))
+        return response
@@ -0,0 +1,146 @@
+import json
+import random
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from store.instrumentation import pool_stats
+from store.models import Book, UserBookRelation
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Drive the book endpoints in-process and report latency percentiles, queries and peak RSS as JSON'
+    scenarios = ('list', 'search', 'ordering', 'detail', 'relation_patch')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--scenario', action='append', choices=self.scenarios,
+                            help='scenarios to run, all by default')
+        parser.add_argument('--cache', action='store_true',
+                            help='keep the response cache, by default every request reaches the database')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        book_ids = list(Book.objects.values_list('id', flat=True))
+        if not book_ids:
+            raise CommandError('No books, run seed_catalogue first')
+        self.rnd = random.Random(options['seed'])
+        self.book_ids = book_ids
+        self.page_size = options['page_size']
+        self.words = [word for name in Book.objects.values_list('name', flat=True)[:200]
+                      for word in name.split() if len(word) >= 3 and not word.isdigit()] or ['book']
+        user_ids = list(UserBookRelation.objects.order_by().values_list('user', flat=True).distinct()[:100])
+        users = list(User.objects.filter(id__in=user_ids)) or [User.objects.create(username='benchmark')]
+
+        overrides = {'ALLOWED_HOSTS': ['testserver'], 'DEBUG': False}
+        if not options['cache']:
+            overrides['CACHES'] = {**settings.CACHES,
+                                   'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            overrides['BOOKS_RESPONSE_CACHE'] = 'benchmark'
+
+        report = {
+            'database': connections['default'].vendor,
+            'books': len(book_ids),
+            'relations': UserBookRelation.objects.count(),
+            'page_size': self.page_size,
+            'cache': options['cache'],
+            'scenarios': {},
+        }
+        with override_settings(**overrides):
+            for name in options['scenario'] or self.scenarios:
+                client = Client()
+                if name == 'relation_patch':
+                    client.force_login(self.rnd.choice(users))
+                request = getattr(self, f'request_{name}')
+                report['scenarios'][name] = self.run(client, request, options['warmup'], options['requests'])
+        report['peak_rss_kb'] = self.peak_rss_kb()
+        report['connections'] = pool_stats()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, client, request, warmup, requests):
+        for _ in range(warmup):
+            request(client)
+        counter = QueryCounter()
+        durations, queries, errors = [], [], 0
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            for _ in range(requests):
+                counter.count = 0
+                start = time.perf_counter()
+                response = request(client)
+                durations.append((time.perf_counter() - start) * 1000)
+                queries.append(counter.count)
+                errors += response.status_code >= 400
+        return {
+            'requests': requests,
+            'errors': errors,
+            **self.percentiles(durations),
+            'mean_ms': round(statistics.fmean(durations), 3) if durations else None,
+            'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+            'max_queries': max(queries, default=None),
+        }
+
+    @staticmethod
+    def percentiles(durations):
+        if len(durations) < 2:
+            value = round(durations[0], 3) if durations else None
+            return {'p50_ms': value, 'p95_ms': value, 'p99_ms': value}
+        cuts = statistics.quantiles(durations, n=100, method='inclusive')
+        return {'p50_ms': round(cuts[49], 3), 'p95_ms': round(cuts[94], 3), 'p99_ms': round(cuts[98], 3)}
+
+    @staticmethod
+    def peak_rss_kb():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes elsewhere
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+    def request_list(self, client):
+        return client.get(reverse('book-list'), {'page_size': self.page_size})
+
+    def request_search(self, client):
+        return client.get(reverse('book-list'), {'page_size': self.page_size, 'search': self.rnd.choice(self.words)})
+
+    def request_ordering(self, client):
+        ordering = self.rnd.choice(('price', '-price', 'autor_name', '-autor_name'))
+        return client.get(reverse('book-list'), {'page_size': self.page_size, 'ordering': ordering})
+
+    def request_detail(self, client):
+        return client.get(reverse('book-detail', args=(self.rnd.choice(self.book_ids),)))
+
+    def request_relation_patch(self, client):
+        data = json.dumps({'like': self.rnd.random() < 0.5, 'rate': self.rnd.randint(1, 5)})
+        return client.patch(reverse('userbookrelation-detail', args=(self.rnd.choice(self.book_ids),)),
+                            data=data, content_type='application/json')
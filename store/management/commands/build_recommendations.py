@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.recommendations import build_similarities, changed_book_ids, np
+
+
+class Command(BaseCommand):
+    help = 'Compute "readers who liked this also liked" neighbours of every book (needs numpy and scipy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int,
+                            help='rebuild these books and the books that share a reader with them')
+        parser.add_argument('--changed', action='store_true',
+                            help='rebuild books changed since the last build, everything on the first run')
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--min-common', type=int, default=None,
+                            help='readers two books need in common to be neighbours')
+        parser.add_argument('--block-size', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('numpy and scipy are required: pip install numpy scipy')
+        book_ids = options['book_ids'] or None
+        if options['changed']:
+            book_ids = changed_book_ids()
+            if book_ids == []:
+                self.stdout.write(self.style.SUCCESS('Nothing changed since the last build'))
+                return
+        start = time.perf_counter()
+        books = build_similarities(book_ids, top_k=options['top_k'], min_common=options['min_common'],
+                                   block_size=options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt neighbours of {books} books in {time.perf_counter() - start:.1f}s'))
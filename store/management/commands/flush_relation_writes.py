@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.relations import flush_relation_writes
+
+
+class Command(BaseCommand):
+    help = 'Apply queued write-behind like/bookmark/rate changes to UserBookRelation and the book counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=0,
+                            help='keep running and flush every INTERVAL seconds, drain once and exit by default')
+
+    def handle(self, *args, **options):
+        batch_size, interval = options['batch_size'], options['interval']
+        total = 0
+        try:
+            while True:
+                # drain, a full batch means more are waiting
+                while True:
+                    flushed = flush_relation_writes(batch_size)
+                    total += flushed
+                    if flushed < batch_size:
+                        break
+                if interval <= 0:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Flushed {total} relation changes'))
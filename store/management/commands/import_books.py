@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import IMPORT_FORMATS, BookImporter, guess_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream books from a CSV (name,price,autor_name header) or JSON lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="file to import, '-' for stdin")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='defaults to the file extension')
+        parser.add_argument('--owner', help='username that owns the imported books')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or guess_format(path)
+        if format is None:
+            raise CommandError('Unknown format, pass --format')
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f'User {options["owner"]} does not exist')
+
+        importer = BookImporter(owner=owner, batch_size=options['batch_size'])
+        if path == '-':
+            report = importer.run(iter_rows(sys.stdin.buffer, format))
+        else:
+            try:
+                with open(path, 'rb') as file:
+                    report = importer.run(iter_rows(file, format))
+            except OSError as exc:
+                raise CommandError(exc)
+
+        for error in report['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["errors"]}')
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f'... {report["error_count"] - len(report["errors"])} more errors')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["created"]} books, {report["error_count"]} rows rejected'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.cache import bump_catalogue_version
+from store.counters import refresh_book_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book like/bookmark/rating counters from UserBookRelation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int,
+                            help='books to rebuild, all books by default')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = refresh_book_counters(options['book_ids'] or None)
+            bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {updated} books'))
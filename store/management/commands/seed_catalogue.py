@@ -0,0 +1,96 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store.cache import bump_catalogue_version
+from store.counters import refresh_book_counters
+from store.models import Book, UserBookRelation
+
+WORDS = ('python', 'django', 'history', 'garden', 'night', 'river', 'algorithms', 'steppe', 'music',
+         'winter', 'ocean', 'database', 'travel', 'kitchen', 'mountain', 'letters', 'empire', 'silence',
+         'science', 'city', 'children', 'stars', 'memory', 'design')
+FIRST_NAMES = ('Aizat', 'Alikhan', 'Yeldana', 'Azat', 'Dana', 'Ivan', 'Maria', 'John', 'Aruzhan', 'Timur')
+LAST_NAMES = ('Kenges', 'Serikuly', 'Yaakov', 'Petrov', 'Smith', 'Abai', 'Nurlan', 'Garcia', 'Kim')
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic users, books and UserBookRelation rows with a few hot books and a long cold tail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--relations', type=int, default=50,
+                            help='average relations per user')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='zipf exponent of book popularity, 0 is uniform')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        users, books, batch_size = options['users'], options['books'], options['batch_size']
+        if users < 1 or books < 1:
+            raise CommandError('--users and --books must be positive')
+        if options['relations'] < 0 or options['skew'] < 0:
+            raise CommandError('--relations and --skew must not be negative')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        rnd = random.Random(options['seed'])
+        # a unique username prefix per run, seeding twice adds a second population
+        prefix = f'seed{rnd.getrandbits(32):08x}'
+
+        with transaction.atomic():
+            User.objects.bulk_create(
+                (User(username=f'{prefix}_{i}', password='!') for i in range(users)), batch_size=batch_size)
+            user_ids = list(User.objects.filter(username__startswith=f'{prefix}_').values_list('id', flat=True))
+            Book.objects.bulk_create((self.make_book(rnd, i, user_ids) for i in range(books)),
+                                     batch_size=batch_size)
+            book_ids = list(Book.objects.order_by('-id').values_list('id', flat=True)[:books])
+            rnd.shuffle(book_ids)
+
+            relations = 0
+            batch = []
+            for relation in self.make_relations(rnd, user_ids, book_ids, options['relations'], options['skew']):
+                batch.append(relation)
+                if len(batch) >= batch_size:
+                    relations += len(UserBookRelation.objects.bulk_create(batch))
+                    batch = []
+            relations += len(UserBookRelation.objects.bulk_create(batch))
+
+            # bulk_create skips the signals that keep the counters
+            for start in range(0, len(book_ids), batch_size):
+                refresh_book_counters(book_ids[start:start + batch_size])
+            bump_catalogue_version(books=True)
+        self.stdout.write(self.style.SUCCESS(f'Seeded {users} users, {books} books, {relations} relations'))
+
+    @staticmethod
+    def make_book(rnd, i, user_ids):
+        title = ' '.join(rnd.sample(WORDS, rnd.randint(1, 4))).capitalize()
+        return Book(name=f'{title} {i}', price=rnd.randint(100, 900000) / 100,
+                    autor_name=f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}',
+                    owner_id=rnd.choice(user_ids) if rnd.random() < 0.2 else None)
+
+    @staticmethod
+    def make_relations(rnd, user_ids, book_ids, average, skew):
+        """
+        every user reads a random number of books around `average`,
+        book rank r is picked with weight 1 / (r + 1) ** skew
+        """
+        per_user = min(average, max(len(book_ids) // 2, 1))
+        if per_user <= 0:
+            return
+        cum_weights = list(accumulate(1 / (rank + 1) ** skew for rank in range(len(book_ids))))
+        for user_id in user_ids:
+            count = min(int(rnd.expovariate(1 / per_user)) + 1, len(book_ids))
+            picked = set()
+            # heavy skew repeats hot books, stop drawing after a bounded number of tries
+            for _ in range(count * 4):
+                picked.update(rnd.choices(book_ids, cum_weights=cum_weights, k=count - len(picked)))
+                if len(picked) >= count:
+                    break
+            for book_id in picked:
+                rate = rnd.choices((None, 1, 2, 3, 4, 5), weights=(50, 3, 5, 12, 15, 15))[0]
+                yield UserBookRelation(user_id=user_id, book_id=book_id, like=rnd.random() < 0.4,
+                                       in_bookmarks=rnd.random() < 0.15, rate=rate)
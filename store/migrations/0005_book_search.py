@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from store.search import install_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS store_book_name_trgm_idx')
+            cursor.execute('DROP INDEX IF EXISTS store_book_autor_name_trgm_idx')
+            cursor.execute('ALTER TABLE store_book DROP COLUMN IF EXISTS search_document')
+        elif connection.vendor == 'sqlite':
+            for trigger in ('store_book_search_ai', 'store_book_search_ad', 'store_book_search_au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute('DROP TABLE IF EXISTS store_book_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_book_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
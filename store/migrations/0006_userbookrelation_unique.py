@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    keep the latest relation of every (user, book) pair
+    """
+    Book = apps.get_model('store', 'Book')
+    UserBookRelation = apps.get_model('store', 'UserBookRelation')
+    duplicates = UserBookRelation.objects.order_by().values('user', 'book') \
+        .annotate(keep=Max('pk'), total=Count('pk')).filter(total__gt=1)
+    for row in duplicates.iterator():
+        UserBookRelation.objects.filter(user=row['user'], book=row['book']).exclude(pk=row['keep']).delete()
+        # historical models have no signals, recount the book
+        counters = UserBookRelation.objects.filter(book=row['book']).aggregate(
+            likes_count=Count('pk', filter=Q(like=True)),
+            bookmarks_count=Count('pk', filter=Q(in_bookmarks=True)),
+            rating_sum=Sum('rate'),
+            rating_count=Count('rate'),
+            **{f'rate_{rate}_count': Count('pk', filter=Q(rate=rate)) for rate in range(1, 6)},
+        )
+        counters['rating_sum'] = counters['rating_sum'] or 0
+        Book.objects.filter(pk=row['book']).update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_book_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userbookrelation',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='store_userbookrelation_user_book_uniq'),
+        ),
+    ]
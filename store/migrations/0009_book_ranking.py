@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+import store.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_ranking(apps, schema_editor):
+    from store.counters import rating_expressions
+
+    Book = apps.get_model('store', 'Book')
+    Book.objects.update(**rating_expressions())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_userbookrelation_user_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_weighted',
+            field=models.FloatField(default=store.models.default_rating_weighted),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-likes_count', 'id'], name='store_book_likes_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-rating_avg', 'id'], name='store_book_rating_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-rating_weighted', 'id'], name='store_book_weighted_rank_idx'),
+        ),
+        migrations.RunPython(fill_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_pendingrelationwrite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('common', models.PositiveIntegerField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.book')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='store.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', '-score'], name='store_booksimilarity_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('book', 'similar'), name='store_booksimilarity_book_similar_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_booksimilarity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['like', '-id'], name='store_ubr_like_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['in_bookmarks', '-id'], name='store_ubr_in_bookmarks_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbookrelation',
+            index=models.Index(fields=['rate', '-id'], name='store_ubr_rate_idx'),
+        ),
+    ]
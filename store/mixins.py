@@ -0,0 +1,29 @@
+from rest_framework.response import Response
+
+
+class ValuesListModelMixin:
+    """
+    list() that pages values_list() rows through `values_serializer_class`
+    instead of model instances through the serializer.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self):
+        if self.values_serializer_class is None:
+            return None
+        return self.values_serializer_class(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        # the paginator reads its cursor position from the ordering columns
+        ordering = [field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)]
+        columns = tuple(dict.fromkeys(values_serializer.columns + tuple(ordering) + ('id',)))
+        rows = queryset.values_list(*columns, named=True)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(rows))
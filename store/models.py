@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, router, transaction
+
+
+def default_rating_weighted():
+    # an unrated book ranks at the prior mean, see store.counters.rating_expressions
+    return float(getattr(settings, 'BOOKS_RATING_PRIOR_MEAN', 3.0))
 
 
 # Create your models here.
@@ -14,6 +20,31 @@ class Book(models.Model):
     # Like, bookmarks
     readers = models.ManyToManyField(User, through='UserBookRelation',
                                      related_name='books')
+    # denormalized counters, maintained by store.signals
+    likes_count = models.PositiveIntegerField(default=0)
+    bookmarks_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # histogram: how many readers gave 1..5 stars
+    rate_1_count = models.PositiveIntegerField(default=0)
+    rate_2_count = models.PositiveIntegerField(default=0)
+    rate_3_count = models.PositiveIntegerField(default=0)
+    rate_4_count = models.PositiveIntegerField(default=0)
+    rate_5_count = models.PositiveIntegerField(default=0)
+    # ranking for ?ordering=rating and /book/top/, maintained with the counters
+    rating_avg = models.FloatField(default=0)
+    rating_weighted = models.FloatField(default=default_rating_weighted)
+    # touched by counter updates too, version stamp for ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # top-N and keyset pages read these in order, id breaks ties
+            models.Index(fields=['-likes_count', 'id'], name='store_book_likes_rank_idx'),
+            models.Index(fields=['-rating_avg', 'id'], name='store_book_rating_rank_idx'),
+            models.Index(fields=['-rating_weighted', 'id'], name='store_book_weighted_rank_idx'),
+        ]
+
     def __str__(self):
         """
         to admin panel
@@ -22,6 +53,33 @@ class Book(models.Model):
         return f'Id {self.id}: {self.name}'
 
 
+class DeletedBook(models.Model):
+    """
+    tombstone of a deleted book, moves the catalogue's Last-Modified and ETag
+    (store.cache.ConditionalGetMixin) where Max(Book.updated_at) cannot
+    """
+    book_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class UserBookRelationQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        one DELETE, then one recount of the books, instead of a post_delete per row
+        """
+        from .cache import bump_catalogue_version
+        from .counters import refresh_book_counters
+
+        with transaction.atomic(using=self.db):
+            book_ids = list(self.order_by().values_list('book_id', flat=True).distinct())
+            deleted = super().delete()
+            if deleted[0]:
+                refresh_book_counters(book_ids)
+        if deleted[0]:
+            bump_catalogue_version(self.db)
+        return deleted
+
+
 class UserBookRelation(models.Model):
     RATE_CHOICES = (
         (1, 'OK'),
@@ -36,6 +94,59 @@ class UserBookRelation(models.Model):
     like = models.BooleanField(default=False)
     in_bookmarks = models.BooleanField(default=False)
     rate = models.PositiveIntegerField(choices=RATE_CHOICES, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserBookRelationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # one relation per reader, lets writes upsert on (user, book)
+            models.UniqueConstraint(fields=['user', 'book'], name='store_userbookrelation_user_book_uniq'),
+        ]
+        indexes = [
+            # /me/bookmarks/ and /me/likes/, only marked rows in (user, id) order
+            models.Index(fields=['user', 'id'], condition=models.Q(in_bookmarks=True),
+                         name='store_ubr_user_bookmarks_idx'),
+            models.Index(fields=['user', 'id'], condition=models.Q(like=True),
+                         name='store_ubr_user_likes_idx'),
+            # admin list filters, newest first
+            models.Index(fields=['like', '-id'], name='store_ubr_like_idx'),
+            models.Index(fields=['in_bookmarks', '-id'], name='store_ubr_in_bookmarks_idx'),
+            models.Index(fields=['rate', '-id'], name='store_ubr_rate_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded state to compute counter deltas on save
+        if not instance.get_deferred_fields() & {'book_id', 'like', 'in_bookmarks', 'rate'}:
+            instance._loaded_state = instance.counter_state()
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Book counters are updated by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(UserBookRelation)):
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # no post_delete receiver: it would turn every Book/User cascade into a DELETE per relation
+        from .cache import bump_catalogue_version
+        from .counters import relation_state_changed
+
+        using = using or router.db_for_write(UserBookRelation, instance=self)
+        with transaction.atomic(using=using):
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            relation_state_changed(getattr(self, '_loaded_state', self.counter_state()), None)
+        bump_catalogue_version(using)
+        return deleted
+
+    def counter_state(self):
+        """
+        fields that Book counters depend on
+        :return: book_id, like, in_bookmarks, rate
+        """
+        return self.__dict__.get('book_id'), self.__dict__.get('like'), \
+            self.__dict__.get('in_bookmarks'), self.__dict__.get('rate')
 
     def __str__(self):
         """
@@ -43,3 +154,58 @@ class UserBookRelation(models.Model):
         :return: id, name
         """
         return f'{self.user.username}: {self.book.name}, RATE: {self.rate}'
+
+
+class PendingRelationWrite(models.Model):
+    """
+    Write-behind queue of like/bookmark/rate changes, one row per (user, book)
+    holding the latest change; NULL means unchanged. Moved into
+    UserBookRelation by store.relations.flush_relation_writes.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='pending_writes')
+    like = models.BooleanField(null=True)
+    in_bookmarks = models.BooleanField(null=True)
+    rate = models.PositiveIntegerField(choices=UserBookRelation.RATE_CHOICES, null=True)
+    # rate can be changed to NULL
+    rate_set = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # coalesces toggles of the same book by the same user
+            models.UniqueConstraint(fields=['user', 'book'], name='store_pendingrelationwrite_user_book_uniq'),
+        ]
+
+    def changes(self):
+        """
+        :return: {field: value} to apply to the UserBookRelation
+        """
+        values = {field: getattr(self, field) for field in ('like', 'in_bookmarks')
+                  if getattr(self, field) is not None}
+        if self.rate_set:
+            values['rate'] = self.rate
+        return values
+
+
+class BookSimilarity(models.Model):
+    """
+    precomputed "readers who liked this also liked" neighbours,
+    written by store.recommendations.build_similarities
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_to')
+    # cosine similarity of the two books' reader sets
+    score = models.FloatField()
+    # readers who liked both
+    common = models.PositiveIntegerField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'similar'], name='store_booksimilarity_book_similar_uniq'),
+        ]
+        indexes = [
+            # /book/<id>/similar/ reads one range in score order
+            models.Index(fields=['book', '-score'], name='store_booksimilarity_rank_idx'),
+        ]
@@ -0,0 +1,192 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counting import approximate_count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite (sort key, ..., id) position.
+
+    The ordering is taken from the queryset after filter backends ran, so
+    OrderingFilter/SearchFilter decide it and `id` is appended as the tie breaker.
+    Every page is a `WHERE (key, id) > (last key, last id)` index range scan
+    instead of an OFFSET scan.
+
+    The total goes to X-Total-Count, estimated for big results (see
+    store.counting) with X-Total-Count-Exact: false.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+    include_count = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page(list(self.get_page_queryset(queryset, request)))
+        if self.include_count:
+            self.count, self.count_exact = approximate_count(queryset)
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page = self.get_page([item async for item in self.get_page_queryset(queryset, request)])
+        if self.include_count:
+            self.count, self.count_exact = await sync_to_async(approximate_count)(queryset)
+        return page
+
+    def get_page_queryset(self, queryset, request):
+        """
+        :return: page_size + 1 rows after the cursor position
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request, queryset)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.position_filter(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        self.has_next = has_more if not self.reverse else self.position is not None
+        self.has_previous = self.position is not None if not self.reverse else has_more
+        self.first_position = self.get_position(results[0]) if results else None
+        self.last_position = self.get_position(results[-1]) if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering:
+            ordering = ['id']
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def position_filter(ordering, position):
+        """
+        (a, b) after (x, y)  ->  a > x OR (a = x AND b > y)
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_position(self, item):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            name = 'id' if name == 'pk' else name
+            # model instance, values() dict or values_list(named=True) row
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            position.append(str(value) if isinstance(value, Decimal) else value)
+        return position
+
+    @staticmethod
+    def get_ordering_field(queryset, name):
+        """
+        :return: model or annotation field the cursor values are converted with
+        """
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field('id' if name == 'pk' else name)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            # cursor from a different ordering
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [self.get_ordering_field(queryset, field.lstrip('-')).to_python(value)
+                        for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse=False):
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            # cursor points past the data, start over
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def get_count_headers(self):
+        if not self.include_count:
+            return {}
+        return {'X-Total-Count': str(self.count), 'X-Total-Count-Exact': 'true' if self.count_exact else 'false'}
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }, headers=self.get_count_headers())
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,123 @@
+"""
+Item-item "readers who liked this also liked" neighbours.
+
+`numpy` and `scipy` are optional: only the offline build needs them,
+/book/<id>/similar/ reads the stored BookSimilarity rows.
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Max, Q
+
+from .cache import bump_catalogue_version
+from .models import Book, BookSimilarity, UserBookRelation
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+
+def positive_relations():
+    """
+    liked or rated at least BOOKS_SIMILAR_MIN_RATE
+    """
+    min_rate = getattr(settings, 'BOOKS_SIMILAR_MIN_RATE', 4)
+    return UserBookRelation.objects.filter(Q(like=True) | Q(rate__gte=min_rate))
+
+
+def changed_book_ids():
+    """
+    books touched (relations change their counters) since the last build
+    :return: book ids, None if nothing was built yet
+    """
+    built_at = BookSimilarity.objects.aggregate(built_at=Max('built_at'))['built_at']
+    if built_at is None:
+        return None
+    return list(Book.objects.filter(updated_at__gte=built_at).values_list('id', flat=True))
+
+
+def load_matrix(chunk_size=100000):
+    """
+    :return: binary users x books CSR matrix, book id of every column
+    """
+    rows = positive_relations().order_by().values_list('user_id', 'book_id').iterator(chunk_size=chunk_size)
+    pairs = np.fromiter((value for pair in rows for value in pair), dtype=np.int64).reshape(-1, 2)
+    user_ids, users = np.unique(pairs[:, 0], return_inverse=True)
+    book_ids, books = np.unique(pairs[:, 1], return_inverse=True)
+    # (user, book) is unique, every entry is 1
+    matrix = sparse.csr_matrix((np.ones(len(pairs), dtype=np.float32), (users, books)),
+                               shape=(len(user_ids), len(book_ids)))
+    return matrix, book_ids
+
+
+def top_neighbours(transposed, columns_matrix, norms, columns, top_k, min_common):
+    """
+    cosine similarity of the books in `columns` to every book, top_k per book
+    :param transposed: books x users CSR
+    :param columns_matrix: users x books CSC
+    :param norms: sqrt(readers) per book
+    :return: arrays (book column, neighbour column, score, common readers), best first per book
+    """
+    co = (transposed @ columns_matrix[:, columns]).tocoo()
+    neighbour, book, common = co.row, columns[co.col], co.data
+    keep = (neighbour != book) & (common >= min_common)
+    neighbour, book, common = neighbour[keep], book[keep], common[keep]
+    # float32 rounding can end up just above 1
+    score = np.minimum(common / (norms[neighbour] * norms[book]), 1.0)
+
+    # by book, best score first, neighbour breaks ties; then the first top_k of every book
+    order = np.lexsort((neighbour, -score, book))
+    neighbour, book, common, score = neighbour[order], book[order], common[order], score[order]
+    rank = np.arange(len(book)) - np.searchsorted(book, book, side='left')
+    keep = rank < top_k
+    return book[keep], neighbour[keep], score[keep], common[keep]
+
+
+def build_similarities(book_ids=None, top_k=None, min_common=None, block_size=2048):
+    """
+    recompute and store the neighbours of all books, or of `book_ids`,
+    the books that share a reader with them and the books listing them
+    :return: number of books whose neighbours were rewritten
+    """
+    if np is None:
+        raise ImportError('numpy and scipy are required to build recommendations')
+    top_k = top_k or getattr(settings, 'BOOKS_SIMILAR_TOP_K', 20)
+    min_common = min_common or getattr(settings, 'BOOKS_SIMILAR_MIN_COMMON', 2)
+    using = router.db_for_write(BookSimilarity)
+    similarities = BookSimilarity.objects.using(using)
+
+    matrix, column_book_ids = load_matrix()
+    transposed = matrix.T.tocsr()
+    columns_matrix = matrix.tocsc()
+    norms = np.sqrt(np.asarray(columns_matrix.sum(axis=0)).ravel())
+
+    if book_ids is None:
+        columns = np.arange(len(column_book_ids))
+        # books nobody likes any more
+        similarities.exclude(book__in=positive_relations().values('book')).delete()
+    else:
+        changed = np.flatnonzero(np.isin(column_book_ids, book_ids))
+        # their scores with every co-read book changed as well
+        co_read = (transposed @ columns_matrix[:, changed]).tocoo().row
+        # and books still listing one as neighbour, it may have lost all its readers
+        owners = set(similarities.filter(similar__in=book_ids).values_list('book_id', flat=True))
+        columns = np.union1d(np.union1d(changed, co_read),
+                             np.flatnonzero(np.isin(column_book_ids, list(owners)))).astype(np.int64)
+        missing = (set(book_ids) | owners) - set(column_book_ids[columns].tolist())
+        similarities.filter(book__in=missing).delete()
+
+    for start in range(0, len(columns), block_size):
+        block = columns[start:start + block_size]
+        books, neighbours, scores, commons = top_neighbours(
+            transposed, columns_matrix, norms, block, top_k, min_common)
+        with transaction.atomic(using=using):
+            similarities.filter(book__in=column_book_ids[block].tolist()).delete()
+            similarities.bulk_create(
+                (BookSimilarity(book_id=book, similar_id=similar, score=score, common=common)
+                 for book, similar, score, common in zip(column_book_ids[books].tolist(),
+                                                         column_book_ids[neighbours].tolist(),
+                                                         scores.tolist(), commons.astype(np.int64).tolist())),
+                batch_size=5000)
+    bump_catalogue_version(using)
+    return len(columns)
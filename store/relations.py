@@ -0,0 +1,214 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_catalogue_version, bump_user_version
+from .counters import refresh_book_counters, relation_state_changed, relation_states_changed
+from .models import Book, PendingRelationWrite, UserBookRelation
+
+RELATION_FIELDS = ('like', 'in_bookmarks', 'rate')
+
+
+def upsert_relation(user, book_id, values):
+    """
+    apply a (partial) like/bookmark/rate change as one INSERT ... ON CONFLICT DO UPDATE,
+    RETURNING gives the stored row
+    :param values: {field: value} for fields from RELATION_FIELDS, other fields keep their value
+    :return: UserBookRelation with the stored state
+    :raise Book.DoesNotExist: unknown book_id
+    """
+    book_id = int(book_id)
+    opts = UserBookRelation._meta
+    using = router.db_for_write(UserBookRelation)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    row = {'user_id': user.pk, 'book_id': book_id}
+    for name in RELATION_FIELDS:
+        field = opts.get_field(name)
+        value = values[name] if name in values else field.get_default()
+        row[field.column] = field.get_db_prep_save(value, connection)
+    row['updated_at'] = opts.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+    columns = [qn(column) for column in row]
+    placeholders = ['%s'] * len(row)
+    if connection.vendor == 'postgresql':
+        # a bare NULL in a SELECT list is text
+        placeholders = [f'CAST(%s AS {opts.get_field(field).cast_db_type(connection)})'
+                        for field in ('user', 'book') + RELATION_FIELDS + ('updated_at',)]
+    # updated_at is always set, ON CONFLICT DO NOTHING would return no row for an empty PATCH
+    updates = [qn(opts.get_field(name).column) for name in RELATION_FIELDS if name in values] + \
+        [qn('updated_at')]
+    returning = ['id'] + [qn(opts.get_field(name).column) for name in RELATION_FIELDS]
+    if connection.vendor == 'postgresql':
+        # a concurrent first write turned our INSERT into an UPDATE
+        returning.append('(xmax = 0)')
+
+    # INSERT ... SELECT inserts nothing for an unknown book
+    book_table = qn(Book._meta.db_table)
+    sql = (f'INSERT INTO {qn(opts.db_table)} ({", ".join(columns)}) '
+           f'SELECT {", ".join(placeholders)} FROM {book_table} WHERE {book_table}.id = %s '
+           f'ON CONFLICT ({qn("user_id")}, {qn("book_id")}) '
+           f'DO UPDATE SET {", ".join(f"{column} = EXCLUDED.{column}" for column in updates)} '
+           f'RETURNING {", ".join(returning)}')
+
+    with transaction.atomic(using=using):
+        old = UserBookRelation.objects.using(using).select_for_update() \
+            .filter(user=user, book_id=book_id).values_list('book_id', *RELATION_FIELDS).first()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(row.values()) + [book_id])
+            returned = cursor.fetchone()
+        if returned is None:
+            raise Book.DoesNotExist(f'Book {book_id} does not exist')
+        pk, like, in_bookmarks, rate, *inserted = returned
+        relation = UserBookRelation(pk=pk, user=user, book_id=book_id,
+                                    like=bool(like), in_bookmarks=bool(in_bookmarks), rate=rate)
+        relation._state.adding = False
+        relation._state.db = using
+        new = relation.counter_state()
+        relation._loaded_state = new
+        if old is None and inserted and not inserted[0]:
+            # created by another transaction meanwhile, its old state is unknown
+            refresh_book_counters([book_id])
+            bump_catalogue_version(using)
+        elif old != new:
+            relation_state_changed(old, new)
+            bump_catalogue_version(using)
+    return relation
+
+
+def bulk_upsert_relations(user, items):
+    """
+    apply many like/bookmark/rate changes of one user in one transaction
+    :param items: [{'book': Book or book id, field: value, ...}], later items for the same book win
+    :return: {book_id: UserBookRelation} with the stored state
+    """
+    changes = {}
+    for item in items:
+        book = item['book']
+        book_id = getattr(book, 'pk', book)
+        changes.setdefault((user.pk, book_id), {}).update(
+            {field: value for field, value in item.items() if field in RELATION_FIELDS})
+    stored = upsert_relation_changes(changes)
+    return {book_id: relation for (_, book_id), relation in stored.items()}
+
+
+def relations_condition(keys):
+    """
+    :param keys: iterable of (user_id, book_id)
+    :return: Q matching their relations, one book__in per user
+    """
+    books_by_user = {}
+    for user_id, book_id in keys:
+        books_by_user.setdefault(user_id, []).append(book_id)
+    condition = Q()
+    for user_id, book_ids in books_by_user.items():
+        condition |= Q(user_id=user_id, book__in=book_ids)
+    return condition
+
+
+def upsert_relation_changes(changes):
+    """
+    apply like/bookmark/rate changes of any users in one transaction,
+    the counters of every book are updated once
+    :param changes: {(user_id, book_id): {field: value}}
+    :return: {(user_id, book_id): UserBookRelation} with the stored state
+    """
+    if not changes:
+        return {}
+    using = router.db_for_write(UserBookRelation)
+    relations = UserBookRelation.objects.using(using).filter(relations_condition(changes))
+    with transaction.atomic(using=using):
+        old = {(state[0], state[1]): state[1:] for state in
+               relations.select_for_update().values_list('user_id', 'book_id', *RELATION_FIELDS)}
+        missing = [key for key in changes if key not in old]
+        if missing:
+            # insert blank rows first: a concurrent first write of the same (user, book)
+            # wins the conflict, and its state is read back locked instead of assumed empty
+            UserBookRelation.objects.using(using).bulk_create(
+                [UserBookRelation(user_id=user_id, book_id=book_id) for user_id, book_id in missing],
+                ignore_conflicts=True)
+            old.update({(state[0], state[1]): state[1:] for state in
+                        relations.filter(relations_condition(missing)).select_for_update()
+                        .values_list('user_id', 'book_id', *RELATION_FIELDS)})
+        # one INSERT ... ON CONFLICT per set of changed fields
+        groups = {}
+        for (user_id, book_id), values in changes.items():
+            groups.setdefault(tuple(sorted(values)), []).append(
+                UserBookRelation(user_id=user_id, book_id=book_id, **values))
+        for fields, objs in groups.items():
+            if fields:
+                UserBookRelation.objects.using(using).bulk_create(
+                    objs, update_conflicts=True, unique_fields=['user', 'book'],
+                    update_fields=fields + ('updated_at',))
+            else:
+                UserBookRelation.objects.using(using).bulk_create(objs, ignore_conflicts=True)
+
+        stored = {(relation.user_id, relation.book_id): relation for relation in relations}
+        changed = [(old.get(key), relation.counter_state()) for key, relation in stored.items()
+                   if old.get(key) != relation.counter_state()]
+        if changed:
+            relation_states_changed(changed)
+            bump_catalogue_version(using)
+    return stored
+
+
+def write_behind_enabled():
+    return getattr(settings, 'BOOKS_RELATION_WRITE_BEHIND', False)
+
+
+def queue_relation(user, book_id, values):
+    """
+    write-behind: record the change in PendingRelationWrite, coalesced per (user, book),
+    flush_relation_writes() applies it later without touching the Book row now
+    :param values: {field: value} for fields from RELATION_FIELDS
+    :return: unsaved UserBookRelation with the stored state and the pending changes applied
+    :raise Book.DoesNotExist: unknown book_id
+    """
+    if not Book.objects.filter(pk=book_id).exists():
+        raise Book.DoesNotExist(f'Book {book_id} does not exist')
+    pending = PendingRelationWrite(user=user, book_id=book_id, rate_set='rate' in values, **values)
+    update_fields = [field for field in RELATION_FIELDS if field in values]
+    if 'rate' in values:
+        update_fields.append('rate_set')
+    PendingRelationWrite.objects.bulk_create([pending], update_conflicts=True, unique_fields=['user', 'book'],
+                                             update_fields=update_fields + ['updated_at'])
+    # only the user's own cached pages show it, the counters move on flush
+    bump_user_version(user.pk)
+    return pending_relation(user, book_id)
+
+
+def pending_relation(user, book_id):
+    """
+    :return: unsaved UserBookRelation with the stored state and the pending changes applied
+    """
+    relation = UserBookRelation.objects.filter(user=user, book_id=book_id).first() or \
+        UserBookRelation(user=user, book_id=book_id)
+    pending = PendingRelationWrite.objects.filter(user=user, book_id=book_id).first()
+    if pending is not None:
+        for field, value in pending.changes().items():
+            setattr(relation, field, value)
+    return relation
+
+
+def flush_relation_writes(batch_size=1000):
+    """
+    move up to batch_size queued changes, oldest first, into UserBookRelation
+    :return: number of flushed changes
+    """
+    using = router.db_for_write(PendingRelationWrite)
+    queue = PendingRelationWrite.objects.using(using)
+    with transaction.atomic(using=using):
+        # concurrent flushers take different rows
+        pending = list(queue.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not pending:
+            return 0
+        upsert_relation_changes({(write.user_id, write.book_id): write.changes() for write in pending})
+        # a change coalesced in meanwhile has a newer updated_at and waits for the next batch,
+        # chunks keep the OR below SQLite's expression depth limit
+        for start in range(0, len(pending), 100):
+            flushed = Q()
+            for write in pending[start:start + 100]:
+                flushed |= Q(pk=write.pk, updated_at=write.updated_at)
+            queue.filter(flushed).delete()
+    return len(pending)
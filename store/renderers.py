@@ -0,0 +1,74 @@
+"""
+Optional fast renderers/parsers.
+
+`orjson` and `msgpack` are optional: FastJSONRenderer falls back to the stock
+JSONRenderer without orjson, the MessagePack classes are only listed in
+REST_FRAMEWORK settings when msgpack is installed.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Decimal, lazy strings, datetimes ... the same way the stock renderer does
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output encoded by orjson (compiled, utf-8 bytes directly).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2) or not self.compact or self.ensure_ascii:
+            # formatting orjson can not reproduce
+            return super().render(data, accepted_media_type, renderer_context)
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=option)
+        except TypeError:
+            # e.g. non-str dict keys
+            return super().render(data, accepted_media_type, renderer_context)
+        # same escaping as JSONRenderer, both are valid JSON but not javascript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
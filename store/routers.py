@@ -0,0 +1,109 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'books_primary'
+
+_pinned = ContextVar('store_pinned_to_primary', default=False)
+
+
+@contextmanager
+def pin_to_primary():
+    """
+    read from the primary inside the block
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def reads_from_primary():
+    """
+    :return: True if catalogue reads of the current request go to the primary
+    """
+    return _pinned.get() or not getattr(settings, 'BOOKS_READ_REPLICAS', ())
+
+
+class ReplicaRouter:
+    """
+    Reads of BOOKS_REPLICA_APPS models go to a random BOOKS_READ_REPLICAS alias,
+    unless the request is pinned to the primary or a transaction is open on it.
+    Writes go to the primary.
+    """
+    primary = DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'BOOKS_READ_REPLICAS', ())
+        if not replicas or model._meta.app_label not in getattr(settings, 'BOOKS_REPLICA_APPS', ('store',)):
+            return None
+        # a transaction must see its own writes
+        if _pinned.get() or connections[self.primary].in_atomic_block:
+            return self.primary
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {self.primary, *getattr(settings, 'BOOKS_READ_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pins writes and, for BOOKS_REPLICA_PIN_SECONDS after a successful write,
+    the writer's reads to the primary so they see their own likes and books.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _pinned.set(self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(request, response)
+
+    @staticmethod
+    def is_pinned(request):
+        if request.method not in SAFE_METHODS:
+            return True
+        try:
+            return float(request.COOKIES[PIN_COOKIE]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    @staticmethod
+    def pin(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            seconds = getattr(settings, 'BOOKS_REPLICA_PIN_SECONDS', 10)
+            response.set_cookie(PIN_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,121 @@
+import operator
+from functools import reduce
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Book
+
+# SQLite: FTS5 shadow table over store_book, trigram tokens give substring matches like ILIKE
+FTS_TABLE = 'store_book_search'
+FTS_MIN_TERM = 3
+
+SQLITE_INDEX = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, autor_name, content='store_book', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS store_book_search_ai AFTER INSERT ON store_book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, autor_name) VALUES (new.id, new.name, new.autor_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS store_book_search_ad AFTER DELETE ON store_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, autor_name)
+        VALUES ('delete', old.id, old.name, old.autor_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS store_book_search_au AFTER UPDATE OF name, autor_name ON store_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, autor_name)
+        VALUES ('delete', old.id, old.name, old.autor_name);
+        INSERT INTO {FTS_TABLE}(rowid, name, autor_name) VALUES (new.id, new.name, new.autor_name);
+    END""",
+]
+SQLITE_TRIGGERS = {'store_book_search_ai', 'store_book_search_ad', 'store_book_search_au'}
+
+# PostgreSQL: generated tsvector for ranking, trigram GIN indexes serve icontains (UPPER(..) LIKE)
+POSTGRESQL_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """ALTER TABLE store_book ADD COLUMN IF NOT EXISTS search_document tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(autor_name, ''))) STORED""",
+    'CREATE INDEX IF NOT EXISTS store_book_search_document_idx ON store_book USING GIN (search_document)',
+    'CREATE INDEX IF NOT EXISTS store_book_name_trgm_idx ON store_book USING GIN (UPPER(name) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS store_book_autor_name_trgm_idx ON store_book USING GIN (UPPER(autor_name) gin_trgm_ops)',
+]
+
+
+def install_search_index(connection):
+    """
+    create (or repair) the search document and its indexes, safe to run repeatedly;
+    SQLite drops the triggers whenever a migration rebuilds store_book
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INDEX:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'store_book'")
+            missing = SQLITE_TRIGGERS - {row[0] for row in cursor.fetchall()}
+            if not missing:
+                return
+            for sql in SQLITE_INDEX:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def has_search_index(connection):
+    # installed by migrations, no lookup so the filter stays usable from async views
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def fts_phrase(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    ?search= contract of SearchFilter (every term in one of search_fields,
+    case insensitive substring), served from the Book search index and ranked.
+    The index covers name and autor_name.
+
+    Without an explicit ?ordering results are ordered by `search_rank`.
+    """
+    rank_annotation = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        connection = connections[queryset.db]
+        if not search_terms or not has_search_index(connection):
+            return super().filter_queryset(request, queryset, view)
+        table = Book._meta.db_table
+
+        search_fields = self.get_search_fields(view, request)
+
+        if connection.vendor == 'postgresql':
+            queryset = self.filter_terms(queryset, search_fields, search_terms)
+            rank = RawSQL(f"ts_rank({table}.search_document, plainto_tsquery('simple', %s))",
+                          (' '.join(search_terms),), output_field=FloatField())
+        else:
+            fts_terms = [term for term in search_terms if len(term) >= FTS_MIN_TERM]
+            # the trigram index can not match shorter terms
+            queryset = self.filter_terms(queryset, search_fields,
+                                         [term for term in search_terms if len(term) < FTS_MIN_TERM])
+            if fts_terms:
+                match = ' AND '.join(fts_phrase(term) for term in fts_terms)
+                queryset = queryset.filter(
+                    id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)))
+                # bm25 is lower for better matches
+                rank = RawSQL(f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                              f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+                              (match,), output_field=FloatField())
+            else:
+                return queryset
+
+        return queryset.annotate(**{self.rank_annotation: rank}).order_by(f'-{self.rank_annotation}', 'id')
+
+    def filter_terms(self, queryset, search_fields, search_terms):
+        if not search_terms:
+            return queryset
+        orm_lookups = [self.construct_search(str(field), queryset) for field in search_fields]
+        conditions = (
+            reduce(operator.or_, (Q(**{lookup: term}) for lookup in orm_lookups))
+            for term in search_terms
+        )
+        return queryset.filter(reduce(operator.and_, conditions))
@@ -1,26 +1,125 @@
+from django.db.models import Count
 from rest_framework import serializers
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, ListSerializer
+from .instrumentation import TimedSerializerMixin, record_timing
 from .models import Book, UserBookRelation
 
 
-class BooksSerializer(ModelSerializer):
+class BooksListSerializer(TimedSerializerMixin, ListSerializer):
+
+    def to_representation(self, data):
+        books = list(data.all() if hasattr(data, 'all') else data)
+        # one grouped query for the whole page instead of one per book
+        missing = [book.pk for book in books if not hasattr(book, 'annotated_likes')]
+        likes_counts = dict.fromkeys(missing, 0)
+        if missing:
+            likes_counts.update(UserBookRelation.objects.filter(book__in=missing, like=True)
+                                .order_by().values('book').annotate(count=Count('pk'))
+                                .values_list('book', 'count'))
+        self.child.likes_counts = likes_counts
+        try:
+            return super().to_representation(books)
+        finally:
+            self.child.likes_counts = None
+
+
+class BooksSerializer(TimedSerializerMixin, ModelSerializer):
     likes_count = serializers.SerializerMethodField()
     # annotated likes
     annotated_likes = serializers.IntegerField(read_only=True)
     # rating average
     rating = serializers.DecimalField(max_digits=3, decimal_places=2,read_only=True)
+    # relation of the current user, annotated by BookViewSet
+    my_like = serializers.BooleanField(read_only=True)
+    my_bookmark = serializers.BooleanField(read_only=True)
+    my_rate = serializers.IntegerField(read_only=True, allow_null=True)
+    # batched likes_count, filled by BooksListSerializer
+    likes_counts = None
+
+    user_fields = ('my_like', 'my_bookmark', 'my_rate')
+
     class Meta:
         model = Book
         # fields = '__all__'
         # to annotate
-        fields = ('id', 'name', 'price', 'autor_name', 'likes_count', 'annotated_likes','rating')
+        fields = ('id', 'name', 'price', 'autor_name', 'likes_count', 'annotated_likes','rating',
+                  'my_like', 'my_bookmark', 'my_rate')
+        list_serializer_class = BooksListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            # only authenticated users have own relations
+            for name in self.user_fields:
+                fields.pop(name)
+        return fields
 
     def get_likes_count(self, instance):
+        if hasattr(instance, 'annotated_likes'):
+            return instance.annotated_likes
+        if self.likes_counts is not None and instance.pk in self.likes_counts:
+            return self.likes_counts[instance.pk]
         # запрос в БД
         return UserBookRelation.objects.filter(book=instance, like=True).count()
 
 
-class UserBookRelationSerializer(ModelSerializer):
+class BookPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    looks books up in context['books'] ({pk: Book}) when the caller loaded them in bulk
+    """
+
+    def to_internal_value(self, data):
+        books = self.context.get('books')
+        if books is None:
+            return super().to_internal_value(data)
+        try:
+            return books[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BookValuesSerializer:
+    """
+    Read-only BooksSerializer output built from values_list() rows,
+    no model instances and no per-field serializer dispatch.
+    """
+    serializer_class = BooksSerializer
+    # output field -> queryset column
+    sources = {'likes_count': 'annotated_likes'}
+
+    def __init__(self, serializer=None):
+        """
+        :param serializer: BooksSerializer whose fields are rendered, its context decides the user fields
+        """
+        fields = (serializer or self.serializer_class()).fields
+        self.columns = tuple(dict.fromkeys(self.sources.get(name, name) for name in fields))
+        self.output = []
+        for name, field in fields.items():
+            index = self.columns.index(self.sources.get(name, name))
+            # only decimals need formatting, other values come from the db as is
+            convert = field.to_representation if isinstance(field, serializers.DecimalField) else None
+            self.output.append((name, index, convert))
+
+    def to_representation(self, rows):
+        with record_timing('serialize'):
+            return list(self.iter_representation(rows))
+
+    def iter_representation(self, rows):
+        """
+        lazy to_representation() for streamed output
+        """
+        output = self.output
+        for row in rows:
+            yield {name: row[index] if convert is None or row[index] is None else convert(row[index])
+                   for name, index, convert in output}
+
+
+class UserBookRelationSerializer(TimedSerializerMixin, ModelSerializer):
+    book = BookPrimaryKeyRelatedField(queryset=Book.objects.all())
+
     class Meta:
         model = UserBookRelation
         fields = ('book', 'like', 'in_bookmarks', 'rate')
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_catalogue_version
+from .counters import refresh_book_counters, relation_state_changed
+from .models import Book, DeletedBook, UserBookRelation
+
+
+@receiver(post_save, sender=UserBookRelation)
+def relation_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata, counters are rebuilt by rebuild_book_counters
+        return
+    old_state = getattr(instance, '_loaded_state', None)
+    new_state = instance.counter_state()
+    if created:
+        relation_state_changed(None, new_state)
+    elif old_state is None or None in (old_state[0], new_state[0]):
+        # saved without being loaded first, the previous state is unknown
+        refresh_book_counters([new_state[0]])
+    else:
+        relation_state_changed(old_state, new_state)
+    instance._loaded_state = new_state
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, using=None, **kwargs):
+    # relations are deleted by UserBookRelation.delete() and its queryset, which keep the counters;
+    # a cascade deletes them in one statement, so the user's go first with one recount
+    UserBookRelation.objects.using(using).filter(user=instance).delete()
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, using=None, **kwargs):
+    DeletedBook.objects.using(using).create(book_id=instance.pk)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=UserBookRelation)
+def catalogue_changed(sender, using=None, **kwargs):
+    bump_catalogue_version(using, books=sender is Book)
@@ -0,0 +1,30 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Query budgets for API tests: `base + per_item * page_size` queries.
+
+    assertPageBudget() runs the request at several page sizes, a per_item of 0
+    pins the endpoint to a constant number of queries however big the page.
+    """
+    budget_page_sizes = (1, 10, 25)
+
+    def assertQueryBudget(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, 1))
+            self.fail(f'{executed} queries, budget is {budget}:\n{queries}')
+        return result
+
+    def assertPageBudget(self, base, per_item, request, page_sizes=None):
+        """
+        :param request: callable(page_size) -> response
+        """
+        for page_size in page_sizes or self.budget_page_sizes:
+            response = self.assertQueryBudget(base + per_item * page_size, request, page_size)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(page_size, len(response.data['results']))
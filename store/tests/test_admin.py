@@ -0,0 +1,86 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.admin import EstimatedCountPaginator
+from store.models import Book, UserBookRelation
+from store.tests.budget import QueryBudgetMixin
+
+
+class AdminTestCase(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.users = [User.objects.create(username=f'reader_{i}') for i in range(5)]
+        self.books = [Book.objects.create(name=f'Book {i}', price=10, autor_name='Author', owner=self.admin)
+                      for i in range(4)]
+        for user in self.users:
+            for book in self.books:
+                UserBookRelation.objects.create(user=user, book=book, like=True, in_bookmarks=True, rate=4)
+        self.client.force_login(self.admin)
+
+    def test_relation_changelist(self):
+        url = reverse('admin:store_userbookrelation_changelist')
+        # session, user, count, page, however many rows
+        response = self.assertQueryBudget(5, self.client.get, url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(20, response.context['cl'].result_count)
+
+        response = self.client.get(url, data={'rate__exact': 4, 'like__exact': 1})
+        self.assertEqual(20, response.context['cl'].result_count)
+
+    def test_book_changelist(self):
+        response = self.assertQueryBudget(5, self.client.get, reverse('admin:store_book_changelist'))
+        self.assertEqual(200, response.status_code)
+
+    def test_relation_change_form(self):
+        relation = UserBookRelation.objects.first()
+        response = self.client.get(reverse('admin:store_userbookrelation_change', args=(relation.id,)))
+        self.assertEqual(200, response.status_code)
+        # no <option> per user or book
+        self.assertNotContains(response, f'<option value="{self.users[-1].id}"')
+        self.assertNotContains(response, 'reader_4</option>')
+
+    def test_unlike_action(self):
+        relations = UserBookRelation.objects.filter(book=self.books[0], user__in=self.users[:3])
+        response = self.client.post(reverse('admin:store_userbookrelation_changelist'), {
+            'action': 'mark_unliked',
+            '_selected_action': [relation.id for relation in relations],
+        })
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(3, UserBookRelation.objects.filter(like=False).count())
+        self.books[0].refresh_from_db()
+        self.assertEqual(2, self.books[0].likes_count)
+
+    def test_clear_rate_action(self):
+        relations = UserBookRelation.objects.filter(book=self.books[1])
+        self.client.post(reverse('admin:store_userbookrelation_changelist'), {
+            'action': 'clear_rate',
+            '_selected_action': [relation.id for relation in relations],
+        })
+        self.books[1].refresh_from_db()
+        self.assertEqual((0, 0, 0.0), (self.books[1].rating_count, self.books[1].rate_4_count,
+                                       self.books[1].rating_avg))
+
+    def test_recount_action(self):
+        Book.objects.filter(pk=self.books[2].pk).update(likes_count=0)
+        self.client.post(reverse('admin:store_book_changelist'), {
+            'action': 'recount',
+            '_selected_action': [self.books[2].id],
+        })
+        self.books[2].refresh_from_db()
+        self.assertEqual(5, self.books[2].likes_count)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+
+    @override_settings(BOOKS_ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_exact_without_statistics(self):
+        Book.objects.create(name='Book', price=10, autor_name='Author')
+        # SQLite has no row estimate
+        self.assertEqual(1, EstimatedCountPaginator(Book.objects.order_by('id'), 10).count)
+
+    def test_registered(self):
+        self.assertIsInstance(site._registry[Book].get_paginator(None, Book.objects.order_by('id'), 10),
+                              EstimatedCountPaginator)
@@ -1,4 +1,5 @@
 import json
+from base64 import urlsafe_b64encode
 
 from django.contrib.auth.models import User
 from django.db.models import Count, Case, When, Avg
@@ -32,7 +33,50 @@ class BooksApiTestCase(APITestCase):
         # without annotate
         # serializer_data = BooksSerializer([self.book_1, self.book_2, self.book_3], many=True).data
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(serializer_data, response.data)
+        self.assertEqual(serializer_data, response.data['results'])
+
+    def test_get_counters(self):
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, like=True, rate=5)
+        user2 = User.objects.create(username='test_username2')
+        UserBookRelation.objects.create(user=user2, book=self.book_1, like=True, rate=4)
+        UserBookRelation.objects.create(user=user2, book=self.book_2, like=False, rate=2)
+        url = reverse('book-list')
+        response = self.client.get(url)
+        books = Book.objects.all().annotate(
+            annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))),
+            # rating
+            rating=Avg('userbookrelation__rate')
+        ).order_by('id')
+        serializer_data = BooksSerializer(books, many=True).data
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(serializer_data, response.data['results'])
+        self.assertEqual(2, response.data['results'][0]['annotated_likes'])
+        self.assertEqual('4.50', response.data['results'][0]['rating'])
+
+    def test_get_my_relations(self):
+        user2 = User.objects.create(username='test_username2')
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, like=True, rate=5)
+        UserBookRelation.objects.create(user=self.user, book=self.book_3, in_bookmarks=True)
+        UserBookRelation.objects.create(user=user2, book=self.book_2, like=True, in_bookmarks=True, rate=1)
+        url = reverse('book-list')
+        self.client.force_login(self.user)
+        # session, user, cache version stamp, the page itself and its total
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        my_relations = [(book['id'], book['my_like'], book['my_bookmark'], book['my_rate'])
+                        for book in response.data['results']]
+        self.assertEqual([(self.book_1.id, True, False, 5),
+                          (self.book_2.id, False, False, None),
+                          (self.book_3.id, False, True, None)], my_relations)
+
+        response = self.client.get(reverse('book-detail', args=(self.book_1.id,)))
+        self.assertEqual((True, False, 5), (response.data['my_like'], response.data['my_bookmark'],
+                                            response.data['my_rate']))
+        # anonymous users get the global fields only
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertNotIn('my_like', response.data['results'][0])
 
 
 # Filter Search Order
@@ -48,7 +92,7 @@ class BooksApiTestCase(APITestCase):
         # without annotate
         # serializer_data = BooksSerializer([self.book_2, self.book_3], many=True).data
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(serializer_data, response.data)
+        self.assertEqual(serializer_data, response.data['results'])
 
     def test_get_search(self):
         url = reverse('book-list')
@@ -62,7 +106,37 @@ class BooksApiTestCase(APITestCase):
         # without annotate
         # serializer_data = BooksSerializer([self.book_1, self.book_2], many=True).data
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(serializer_data, response.data)
+        # ranked by relevance
+        self.assertEqual(serializer_data, sorted(response.data['results'], key=lambda book: book['id']))
+
+    def test_get_search_substring(self):
+        url = reverse('book-list')
+        # middle of a word, any case, every term must match
+        response = self.client.get(url, data={'search': 'ELDAN kenges'})
+        self.assertEqual({self.book_1.id, self.book_2.id}, {book['id'] for book in response.data['results']})
+        response = self.client.get(url, data={'search': 'eldan book 2'})
+        self.assertEqual([], response.data['results'])
+        # shorter than a trigram
+        response = self.client.get(url, data={'search': 'Se'})
+        self.assertEqual([self.book_3.id], [book['id'] for book in response.data['results']])
+        response = self.client.get(url, data={'search': 'Aizat', 'ordering': 'price'})
+        self.assertEqual([self.book_2.id], [book['id'] for book in response.data['results']])
+
+    def test_get_search_rank(self):
+        book = Book.objects.create(name='Kenges about Kenges', price=100.00, autor_name='Kenges')
+        url = reverse('book-list')
+        response = self.client.get(url, data={'search': 'kenges', 'page_size': 1})
+        self.assertEqual([book.id], [book['id'] for book in response.data['results']])
+        response = self.client.get(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(1, len(response.data['results']))
+        self.assertIsNone(response.data['next'])
+        # renamed books are reindexed
+        book.name = 'Python 3'
+        book.autor_name = 'Azat Yaakov'
+        book.save()
+        response = self.client.get(url, data={'search': 'Yaakov'})
+        self.assertEqual([book.id], [book['id'] for book in response.data['results']])
 
     def test_get_ordering(self):
         url = reverse('book-list')
@@ -71,13 +145,61 @@ class BooksApiTestCase(APITestCase):
             annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))),
             # rating
             rating=Avg('userbookrelation__rate')
-        ).order_by('id')
+        ).order_by('autor_name', 'id')
         serializer_data = BooksSerializer(books, many=True).data
         # without annotate
         # serializer_data = BooksSerializer([self.book_2, self.book_3, self.book_1], many=True).data
         print(response.data)
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(serializer_data, response.data)
+        self.assertEqual(serializer_data, response.data['results'])
+
+# Pagination
+    def test_get_pages(self):
+        for i in range(5):
+            Book.objects.create(name=f'Paged book {i}', price=1000.00 + i % 2, autor_name='Azat Yaakov')
+        url = reverse('book-list')
+        for ordering in ('id', 'price', '-price', 'autor_name'):
+            expected = list(Book.objects.order_by(ordering.replace('id', 'pk'), 'id')
+                            .values_list('id', flat=True))
+            ids = []
+            response = self.client.get(url, data={'ordering': ordering, 'page_size': 3})
+            self.assertIsNone(response.data['previous'])
+            while True:
+                self.assertEqual(status.HTTP_200_OK, response.status_code)
+                self.assertLessEqual(len(response.data['results']), 3)
+                ids += [book['id'] for book in response.data['results']]
+                if response.data['next'] is None:
+                    break
+                response = self.client.get(response.data['next'])
+            self.assertEqual(expected, ids, ordering)
+
+            # and back again from the last page (8 books: 3 + 3 + 2)
+            ids = []
+            while response.data['previous'] is not None:
+                response = self.client.get(response.data['previous'])
+                ids = [book['id'] for book in response.data['results']] + ids
+            self.assertEqual(expected[:6], ids, ordering)
+
+    def test_get_pages_filtered(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'price': 1515.00, 'page_size': 1, 'ordering': '-autor_name'})
+        self.assertEqual([self.book_1.id], [book['id'] for book in response.data['results']])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([self.book_2.id], [book['id'] for book in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_get_invalid_cursor(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'cursor': 'garbage'})
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_get_invalid_cursor_values(self):
+        url = reverse('book-list')
+        for ordering, position in (('', ['abc']), ('', [{'a': 1}]), ('', [None]),
+                                   ('price', ['zz', 1]), ('price', [[1], 1]), ('price', [None, 1])):
+            cursor = urlsafe_b64encode(json.dumps({'p': position}).encode()).decode('ascii')
+            response = self.client.get(url, data={'cursor': cursor, 'ordering': ordering})
+            self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code, position)
 
 # CRUD
     def test_create(self):
@@ -217,3 +339,173 @@ class BooksRelationTestCase(APITestCase):
 #        relation = UserBookRelation.objects.get(user=self.user,
 #                                               book=self.book_1)
 #        self.assertEqual(3, relation.rate)
+
+    def test_like_upsert(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.force_login(self.user)
+        response = self.client.patch(url, data=json.dumps({"like": True, "rate": 4}),
+                                     content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': False, 'rate': 4},
+                         response.data)
+        # other fields are kept
+        response = self.client.patch(url, data=json.dumps({"in_bookmarks": True}),
+                                     content_type='application/json')
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': True, 'rate': 4},
+                         response.data)
+        response = self.client.patch(url, data=json.dumps({"like": False}),
+                                     content_type='application/json')
+        self.assertEqual(1, UserBookRelation.objects.filter(user=self.user, book=self.book_1).count())
+        self.book_1.refresh_from_db()
+        self.assertEqual((0, 1, 4, 1), (self.book_1.likes_count, self.book_1.bookmarks_count,
+                                        self.book_1.rating_sum, self.book_1.rate_4_count))
+
+    def test_like_unknown_book(self):
+        url = reverse('userbookrelation-detail', args=(self.book_3.id + 100,))
+        self.client.force_login(self.user)
+        response = self.client.patch(url, data=json.dumps({"like": True}),
+                                     content_type='application/json')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertFalse(UserBookRelation.objects.exists())
+
+    def test_bulk(self):
+        UserBookRelation.objects.create(user=self.user, book=self.book_2, like=True, rate=2)
+        url = reverse('userbookrelation-bulk')
+        data = [
+            {"book": self.book_1.id, "like": True, "rate": 5},
+            {"book": self.book_2.id, "in_bookmarks": True},
+            {"book": self.book_3.id},
+            {"book": self.book_1.id, "in_bookmarks": True},
+        ]
+        self.client.force_login(self.user)
+        # first writes of book_1 and book_3 insert blank rows and read them back locked
+        with self.assertNumQueries(14):
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code, response.data)
+        expected = [
+            {'book': self.book_1.id, 'like': True, 'in_bookmarks': True, 'rate': 5},
+            {'book': self.book_2.id, 'like': True, 'in_bookmarks': True, 'rate': 2},
+            {'book': self.book_3.id, 'like': False, 'in_bookmarks': False, 'rate': None},
+            {'book': self.book_1.id, 'like': True, 'in_bookmarks': True, 'rate': 5},
+        ]
+        self.assertEqual(expected, response.data)
+        self.assertEqual(3, UserBookRelation.objects.filter(user=self.user).count())
+        self.book_1.refresh_from_db()
+        self.book_2.refresh_from_db()
+        self.assertEqual((1, 1, 5), (self.book_1.likes_count, self.book_1.bookmarks_count, self.book_1.rating_sum))
+        self.assertEqual((1, 1, 2), (self.book_2.likes_count, self.book_2.bookmarks_count, self.book_2.rating_sum))
+
+    def test_bulk_wrong(self):
+        url = reverse('userbookrelation-bulk')
+        data = [
+            {"book": self.book_1.id, "like": True},
+            {"book": self.book_3.id + 100, "like": True},
+            {"like": True},
+            {"book": self.book_2.id, "rate": 6},
+        ]
+        self.client.force_login(self.user)
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        # errors by item index
+        self.assertNotIn(0, response.data)
+        self.assertEqual(['book'], list(response.data[1]))
+        self.assertEqual(['book'], list(response.data[2]))
+        self.assertEqual(['rate'], list(response.data[3]))
+        self.assertFalse(UserBookRelation.objects.exists())
+
+
+class MyBooksApiTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.user2 = User.objects.create(username='test_username2')
+        self.books = [Book.objects.create(name=f'Test book {i}', price=100 + i, autor_name='Author')
+                      for i in range(5)]
+        # relations created out of book order
+        for book in (self.books[3], self.books[0], self.books[4], self.books[1]):
+            UserBookRelation.objects.create(user=self.user, book=book, in_bookmarks=True,
+                                            like=book != self.books[4])
+        UserBookRelation.objects.create(user=self.user, book=self.books[2], rate=4)
+        UserBookRelation.objects.create(user=self.user2, book=self.books[2], like=True, in_bookmarks=True)
+
+    def test_bookmarks(self):
+        url = reverse('my-bookmarks-list')
+        self.client.force_login(self.user)
+        ids = []
+        response = self.client.get(url, data={'page_size': 3})
+        while True:
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            ids += [book['id'] for book in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        expected = [book.id for book in (self.books[1], self.books[4], self.books[0], self.books[3])]
+        self.assertEqual(expected, ids)
+
+        first = self.client.get(url).data['results'][0]
+        self.assertEqual((True, True, None), (first['my_like'], first['my_bookmark'], first['my_rate']))
+
+    def test_likes(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('my-likes-list'))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        expected = [book.id for book in (self.books[1], self.books[0], self.books[3])]
+        self.assertEqual(expected, [book['id'] for book in response.data['results']])
+        self.assertEqual(1, response.data['results'][0]['likes_count'])
+
+    def test_anonymous(self):
+        response = self.client.get(reverse('my-likes-list'))
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+
+class BookRankingApiTestCase(APITestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'test_username{i}') for i in range(4)]
+        self.books = [Book.objects.create(name=f'Test book {i}', price=100, autor_name='Author') for i in range(4)]
+        # book 0: one 5, book 1: four 4s, book 2: two 2s and many likes, book 3: unrated
+        UserBookRelation.objects.create(user=self.users[0], book=self.books[0], rate=5)
+        for user in self.users:
+            UserBookRelation.objects.create(user=user, book=self.books[1], rate=4)
+            UserBookRelation.objects.create(user=user, book=self.books[2], like=True,
+                                            rate=2 if user in self.users[:2] else None)
+
+    def get_ids(self, url, **params):
+        response = self.client.get(url, data=params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [self.books.index(Book.objects.get(id=book['id'])) for book in results]
+
+    def test_ordering(self):
+        url = reverse('book-list')
+        self.assertEqual([0, 1, 2, 3], self.get_ids(url, ordering='-rating'))
+        self.assertEqual([3, 2, 1, 0], self.get_ids(url, ordering='rating'))
+        self.assertEqual([1, 0, 3, 2], self.get_ids(url, ordering='-weighted_rating'))
+        self.assertEqual([2, 0, 1, 3], self.get_ids(url, ordering='-likes'))
+        self.assertEqual([2, 0, 1, 3], self.get_ids(url, ordering='-annotated_likes'))
+
+    def test_ordering_pages(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'ordering': '-rating', 'page_size': 3})
+        ids = [book['id'] for book in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [book['id'] for book in response.data['results']]
+        self.assertEqual([book.id for book in self.books], ids)
+
+    def test_top(self):
+        url = reverse('book-top')
+        self.assertEqual([1, 0, 3, 2], self.get_ids(url))
+        self.assertEqual([0, 1], self.get_ids(url, by='rating', limit=2))
+        self.assertEqual([2], self.get_ids(url, by='likes', limit=1))
+        # served from the ranking index, one query plus the version stamp
+        with self.assertNumQueries(2):
+            response = self.client.get(url, data={'limit': 3})
+        self.assertEqual(3, len(response.data))
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, self.client.get(url, data={'by': 'price'}).status_code)
+
+    def test_top_updates(self):
+        url = reverse('book-top')
+        self.assertEqual(1, self.get_ids(url, by='rating')[1])
+        UserBookRelation.objects.filter(book=self.books[0]).delete()
+        # the cached response was invalidated by the counter update
+        self.assertEqual([1, 2, 0, 3], self.get_ids(url, by='rating'))
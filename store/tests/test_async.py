@@ -0,0 +1,105 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from store.models import Book, PendingRelationWrite, UserBookRelation
+
+
+class AsyncBooksApiTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.user2 = User.objects.create(username='test_username2')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges',
+                                          owner=self.user)
+        self.book_2 = Book.objects.create(name='Yeldana book', price=1515.00, autor_name='Aizat Kenges')
+        self.book_3 = Book.objects.create(name='Test book 2', price=1000.00, autor_name='Alikhan Serikuly')
+
+    async def test_list(self):
+        for params in ({}, {'price': 1515.00}, {'search': 'Yeldana'}, {'ordering': '-autor_name'},
+                       {'ordering': 'price', 'page_size': 2}):
+            response = await self.async_client.get(reverse('async-book-list'), params)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            expected = await sync_to_async(self.client.get)(reverse('book-list'), params)
+            self.assertEqual(json.loads(expected.content)['results'], json.loads(response.content)['results'])
+            self.assertEqual(expected['X-Total-Count'], response['X-Total-Count'])
+
+    async def test_list_pages(self):
+        url = reverse('async-book-list')
+        response = await self.async_client.get(url, {'page_size': 2})
+        data = json.loads(response.content)
+        self.assertEqual([self.book_1.id, self.book_2.id], [book['id'] for book in data['results']])
+        response = await self.async_client.get(data['next'])
+        data = json.loads(response.content)
+        self.assertEqual([self.book_3.id], [book['id'] for book in data['results']])
+        self.assertIsNone(data['next'])
+
+    async def test_detail(self):
+        url = reverse('async-book-detail', args=(self.book_1.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('Test book 1', json.loads(response.content)['name'])
+        response = await self.async_client.get(reverse('async-book-detail', args=(self.book_3.id + 100,)))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    async def test_update_permissions(self):
+        url = reverse('async-book-detail', args=(self.book_1.id,))
+        data = json.dumps({'price': '3000.00'})
+        response = await self.async_client.patch(url, data, content_type='application/json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+        await self.async_client.aforce_login(self.user2)
+        response = await self.async_client.patch(url, data, content_type='application/json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.patch(url, data, content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('3000.00', json.loads(response.content)['price'])
+        await self.book_1.arefresh_from_db()
+        self.assertEqual(3000, self.book_1.price)
+
+    async def test_relation(self):
+        url = reverse('async-book-relation', args=(self.book_1.id,))
+        response = await self.async_client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.patch(url, json.dumps({'like': True, 'rate': 4}),
+                                                 content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': False, 'rate': 4},
+                         json.loads(response.content))
+        response = await self.async_client.patch(url, json.dumps({'rate': 6}), content_type='application/json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+        relation = await UserBookRelation.objects.aget(user=self.user, book=self.book_1)
+        self.assertEqual((True, 4), (relation.like, relation.rate))
+        await self.book_1.arefresh_from_db()
+        self.assertEqual((1, 4), (self.book_1.likes_count, self.book_1.rating_sum))
+
+        # repeated toggles move the counters from the stored state only
+        for rate in (4, 5):
+            await self.async_client.patch(url, json.dumps({'like': True, 'rate': rate}),
+                                          content_type='application/json')
+        await self.book_1.arefresh_from_db()
+        self.assertEqual((1, 5, 1), (self.book_1.likes_count, self.book_1.rating_sum, self.book_1.rating_count))
+
+        response = await self.async_client.patch(reverse('async-book-relation', args=(self.book_3.id + 100,)),
+                                                 json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    @override_settings(BOOKS_RELATION_WRITE_BEHIND=True)
+    async def test_relation_write_behind(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('async-book-relation', args=(self.book_1.id,))
+        response = await self.async_client.patch(url, json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': False, 'rate': None},
+                         json.loads(response.content))
+        self.assertFalse(await UserBookRelation.objects.filter(user=self.user).aexists())
+        self.assertTrue(await PendingRelationWrite.objects.filter(user=self.user, book=self.book_1).aexists())
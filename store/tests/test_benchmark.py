@@ -0,0 +1,43 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Q
+from django.test import TestCase
+
+from store.models import Book, UserBookRelation
+
+
+class SeedAndBenchmarkTestCase(TestCase):
+
+    def test_seed_catalogue(self):
+        call_command('seed_catalogue', users=40, books=200, relations=10, seed=1, batch_size=50, stdout=StringIO())
+        self.assertEqual((40, 200), (User.objects.count(), Book.objects.count()))
+        self.assertTrue(UserBookRelation.objects.exists())
+        # counters are rebuilt after bulk_create
+        counted = Book.objects.annotate(likes=Count('userbookrelation', filter=Q(userbookrelation__like=True)))
+        self.assertEqual(list(counted.values_list('likes', flat=True).order_by('id')),
+                         list(Book.objects.values_list('likes_count', flat=True).order_by('id')))
+        # skewed: the most read book has several times the average readers
+        readers = sorted(Book.objects.annotate(readers_count=Count('readers')).values_list('readers_count', flat=True))
+        self.assertGreater(readers[-1], 3 * sum(readers) / len(readers))
+
+    def test_seed_without_relations(self):
+        call_command('seed_catalogue', users=5, books=10, relations=0, seed=1, stdout=StringIO())
+        self.assertEqual(10, Book.objects.count())
+        self.assertFalse(UserBookRelation.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('seed_catalogue', users=5, books=10, relations=-1, stdout=StringIO())
+
+    def test_benchmark(self):
+        call_command('seed_catalogue', users=10, books=30, relations=5, seed=2, stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark', requests=3, warmup=1, seed=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(['list', 'search', 'ordering', 'detail', 'relation_patch'], list(report['scenarios']))
+        for name, scenario in report['scenarios'].items():
+            self.assertEqual(0, scenario['errors'], name)
+            self.assertLessEqual(scenario['p50_ms'], scenario['p99_ms'])
+            self.assertGreater(scenario['queries_per_request'], 0)
+        self.assertIn('peak_rss_kb', report)
@@ -0,0 +1,138 @@
+import json
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.models import Book, UserBookRelation
+
+
+class BookResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges',
+                                          owner=self.user)
+        self.book_2 = Book.objects.create(name='Yeldana book', price=1515.00, autor_name='Aizat Kenges')
+
+    def assertCached(self, url, data=None):
+        response = self.client.get(url, data=data)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        # only the ETag version stamp is read
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, data=data)
+        self.assertEqual(response.content, cached.content)
+        self.assertEqual(response['Content-Type'], cached['Content-Type'])
+        return json.loads(cached.content)
+
+    def test_list(self):
+        url = reverse('book-list')
+        self.assertCached(url, {'ordering': 'price', 'search': 'Yeldana'})
+        # same parameters in another order
+        with self.assertNumQueries(1):
+            self.client.get(url, {'search': 'Yeldana', 'ordering': 'price'})
+        with self.assertNumQueries(2):
+            self.client.get(url, {'ordering': '-price', 'search': 'Yeldana'})
+
+    def test_retrieve(self):
+        url = reverse('book-detail', args=(self.book_1.id,))
+        self.assertEqual('Test book 1', self.assertCached(url)['name'])
+        # a write bumps the catalogue version
+        self.book_1.name = 'Python 3'
+        self.book_1.save()
+        self.assertEqual('Python 3', self.assertCached(url)['name'])
+
+    def test_relation_invalidates(self):
+        url = reverse('book-list')
+        self.assertEqual(0, self.assertCached(url)['results'][0]['likes_count'])
+        self.client.force_login(self.user)
+        self.client.patch(reverse('userbookrelation-detail', args=(self.book_1.id,)),
+                          data=json.dumps({'like': True}), content_type='application/json')
+        self.client.logout()
+        self.assertEqual(1, self.assertCached(url)['results'][0]['likes_count'])
+        UserBookRelation.objects.get(user=self.user).delete()
+        self.assertEqual(0, self.assertCached(url)['results'][0]['likes_count'])
+
+    def test_file_based(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache_settings = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                          'LOCATION': location}}
+            with override_settings(CACHES=cache_settings):
+                self.assertCached(reverse('book-list'))
+                caches['default'].clear()
+
+
+class BookConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges',
+                                          owner=self.user)
+        self.book_2 = Book.objects.create(name='Yeldana book', price=1515.00, autor_name='Aizat Kenges')
+
+    def test_etag(self):
+        for url in (reverse('book-list'), reverse('book-detail', args=(self.book_1.id,))):
+            response = self.client.get(url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            etag = response['ETag']
+            self.assertTrue(response.has_header('Last-Modified'))
+            # only the version stamp is read
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+            self.assertEqual(etag, response['ETag'])
+            self.assertEqual(b'', response.content)
+
+            # another representation of the same data
+            response = self.client.get(url, {'ordering': 'price'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_etag_changes(self):
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        UserBookRelation.objects.create(user=self.user, book=self.book_2, like=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+        etag = response['ETag']
+        self.book_2.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(json.loads(response.content)['results']))
+
+    def test_if_modified_since(self):
+        url = reverse('book-detail', args=(self.book_1.id,))
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_if_modified_since_delete(self):
+        url = reverse('book-list')
+        Book.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED,
+                         self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code)
+        self.book_2.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(json.loads(response.content)['results']))
+
+    def test_etag_shared_by_workers(self):
+        url = reverse('book-list')
+        etag = self.client.get(url)['ETag']
+        # another worker's local cache, another catalogue version
+        caches['default'].clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_missing(self):
+        response = self.client.get(reverse('book-detail', args=(self.book_2.id + 100,)))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertFalse(response.has_header('ETag'))
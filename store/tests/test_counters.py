@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from store.models import Book, UserBookRelation
+from store.relations import upsert_relation_changes
+
+
+class BookCountersTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='user1')
+        self.user2 = User.objects.create(username='user2')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515, autor_name='Yeldana Kenges')
+        self.book_2 = Book.objects.create(name='Test book 2', price=2000, autor_name='Aizat Kenges')
+
+    def assertCounters(self, book, **expected):
+        book.refresh_from_db()
+        actual = {field: getattr(book, field) for field in expected}
+        self.assertEqual(expected, actual)
+
+    def test_create(self):
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=5)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, in_bookmarks=True, rate=4)
+        self.assertCounters(self.book_1, likes_count=1, bookmarks_count=1, rating_sum=9,
+                            rating_count=2, rate_4_count=1, rate_5_count=1)
+        self.assertCounters(self.book_2, likes_count=0, rating_count=0)
+
+    def test_update(self):
+        relation = UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=5)
+        relation = UserBookRelation.objects.get(pk=relation.pk)
+        relation.like = False
+        relation.rate = 2
+        relation.save()
+        self.assertCounters(self.book_1, likes_count=0, rating_sum=2, rating_count=1,
+                            rate_2_count=1, rate_5_count=0)
+
+        # move relation to another book
+        relation.book = self.book_2
+        relation.save()
+        self.assertCounters(self.book_1, rating_sum=0, rating_count=0, rate_2_count=0)
+        self.assertCounters(self.book_2, rating_sum=2, rating_count=1, rate_2_count=1)
+
+    def test_delete(self):
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=5)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, like=True, rate=3)
+        UserBookRelation.objects.filter(user=self.user1).delete()
+        self.assertCounters(self.book_1, likes_count=1, rating_sum=3, rating_count=1,
+                            rate_3_count=1, rate_5_count=0)
+
+        self.user2.delete()
+        self.assertCounters(self.book_1, likes_count=0, rating_sum=0, rating_count=0, rate_3_count=0)
+
+    def test_delete_cascade(self):
+        books = Book.objects.bulk_create(Book(name=f'Book {i}', price=100, autor_name='Author')
+                                         for i in range(20))
+        user3 = User.objects.create(username='user3')
+        for book in books:
+            UserBookRelation.objects.create(user=user3, book=book, like=True, rate=4)
+            UserBookRelation.objects.create(user=self.user1, book=book, like=True)
+        user_id = user3.pk
+        # independent of the number of relations: no DELETE and counter UPDATE per row
+        with self.assertNumQueries(14):
+            user3.delete()
+        self.assertCounters(books[0], likes_count=1, rating_count=0, rate_4_count=0)
+        self.assertFalse(UserBookRelation.objects.filter(user_id=user_id).exists())
+        book_id = books[0].pk
+        with self.assertNumQueries(5):
+            books[0].delete()
+        self.assertFalse(UserBookRelation.objects.filter(book_id=book_id).exists())
+
+    def test_concurrent_first_write(self):
+        select_for_update = QuerySet.select_for_update
+        calls = []
+
+        def racing_select_for_update(queryset, *args, **kwargs):
+            calls.append(queryset)
+            if len(calls) == 1:
+                # another transaction inserts the relation right after our locked read
+                UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True)
+                queryset = queryset.none()
+            return select_for_update(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'select_for_update', racing_select_for_update):
+            upsert_relation_changes({(self.user1.pk, self.book_1.pk): {'like': True, 'rate': 5}})
+        self.assertCounters(self.book_1, likes_count=1, rating_sum=5, rating_count=1)
+
+    def test_rebuild(self):
+        UserBookRelation.objects.create(user=self.user1, book=self.book_1, like=True, rate=5)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_2, in_bookmarks=True, rate=1)
+        # bulk update skips signals
+        UserBookRelation.objects.update(like=True, rate=4)
+        call_command('rebuild_book_counters', stdout=StringIO())
+        self.assertCounters(self.book_1, likes_count=1, rating_sum=4, rating_count=1,
+                            rate_4_count=1, rate_5_count=0)
+        self.assertCounters(self.book_2, likes_count=1, bookmarks_count=1, rating_sum=4,
+                            rating_count=1, rate_1_count=0, rate_4_count=1)
+
+    @override_settings(BOOKS_RATING_PRIOR_MEAN=3.0, BOOKS_RATING_PRIOR_WEIGHT=2)
+    def test_ranking(self):
+        self.assertCounters(self.book_1, rating_avg=0, rating_weighted=3.0)
+        relation = UserBookRelation.objects.create(user=self.user1, book=self.book_1, rate=5)
+        UserBookRelation.objects.create(user=self.user2, book=self.book_1, like=True, rate=4)
+        # (3 * 2 + 5 + 4) / (2 + 2)
+        self.assertCounters(self.book_1, rating_avg=4.5, rating_weighted=3.75)
+        relation.delete()
+        self.assertCounters(self.book_1, rating_avg=4.0, rating_weighted=(6 + 4) / 3)
+
+        UserBookRelation.objects.update(rate=None)
+        call_command('rebuild_book_counters', stdout=StringIO())
+        self.assertCounters(self.book_1, rating_avg=0, rating_weighted=3.0)
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.cache import bump_catalogue_version, get_cache
+from store.counting import approximate_count, estimate_count
+from store.models import Book, UserBookRelation
+
+
+class ApproximateCountTestCase(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        for i in range(3):
+            Book.objects.create(name=f'Book {i}', price=10 + i, autor_name='Author')
+
+    def test_exact_and_cached(self):
+        books = Book.objects.filter(price__gte=11)
+        self.assertEqual((2, True), approximate_count(books))
+        with self.assertNumQueries(0):
+            self.assertEqual((2, True), approximate_count(books.order_by('-id')))
+        # another filter is another count
+        self.assertEqual((3, True), approximate_count(Book.objects.all()))
+
+    def test_invalidated(self):
+        self.assertEqual((3, True), approximate_count(Book.objects.all()))
+        Book.objects.create(name='Book 3', price=10, autor_name='Author')
+        self.assertEqual((4, True), approximate_count(Book.objects.all()))
+
+    def test_kept_across_relation_writes(self):
+        user = User.objects.create(username='reader')
+        books = Book.objects.filter(price__gte=11)
+        self.assertEqual((2, True), approximate_count(books))
+        UserBookRelation.objects.create(user=user, book=Book.objects.first(), like=True)
+        with self.assertNumQueries(0):
+            self.assertEqual((2, True), approximate_count(books))
+        # /me/likes/ joins the relations, their writes change its count
+        likes = user.books.filter(userbookrelation__like=True)
+        self.assertEqual((1, True), approximate_count(likes))
+        UserBookRelation.objects.create(user=user, book=Book.objects.last(), like=True)
+        self.assertEqual((2, True), approximate_count(likes))
+
+    def test_estimate(self):
+        # SQLite keeps no row estimates
+        self.assertIsNone(estimate_count(Book.objects.all()))
+        with patch('store.counting.estimate_count', return_value=50000):
+            self.assertEqual((50000, False), approximate_count(Book.objects.filter(price=10)))
+            bump_catalogue_version(books=True)
+            # below the threshold the exact count is cheap enough
+            self.assertEqual((1, True), approximate_count(Book.objects.filter(price=10), threshold=100000))
+
+
+class CountHeadersTestCase(APITestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        for i in range(3):
+            Book.objects.create(name=f'Book {i}', price=10 + i, autor_name='Author')
+
+    def test_list(self):
+        url = reverse('book-list')
+        response = self.client.get(url, data={'page_size': 1})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(('3', 'true'), (response['X-Total-Count'], response['X-Total-Count-Exact']))
+
+        response = self.client.get(url, data={'price': 10})
+        self.assertEqual('1', response['X-Total-Count'])
+
+        # replayed by the response cache
+        response = self.client.get(url, data={'page_size': 1})
+        self.assertFalse(hasattr(response, 'data'))
+        self.assertEqual(('3', 'true'), (response['X-Total-Count'], response['X-Total-Count-Exact']))
+
+    def test_estimated(self):
+        with patch('store.counting.estimate_count', return_value=250000):
+            response = self.client.get(reverse('book-list'))
+        self.assertEqual(('250000', 'false'), (response['X-Total-Count'], response['X-Total-Count-Exact']))
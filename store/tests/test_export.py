@@ -0,0 +1,55 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.models import Book, UserBookRelation
+
+
+class BookExportTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges',
+                                          owner=self.user)
+        self.book_2 = Book.objects.create(name='Yeldana, "quoted" book', price=1000.50, autor_name='Aizat Kenges')
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, like=True, rate=4)
+
+    def get_content(self, response):
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response = self.client.get(reverse('book-export', args=('ndjson',)))
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        lines = [json.loads(line) for line in self.get_content(response).splitlines()]
+        # same fields as the list endpoint
+        listed = json.loads(self.client.get(reverse('book-list')).content)['results']
+        self.assertEqual(listed, lines)
+        self.assertEqual([1, 0], [line['likes_count'] for line in lines])
+        self.assertEqual('4.00', lines[0]['rating'])
+
+    def test_csv(self):
+        response = self.client.get(reverse('book-export', args=('csv',)), {'price': '1000.50'})
+        self.assertEqual('attachment; filename="books.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(self.get_content(response))))
+        self.assertEqual(['id', 'name', 'price', 'autor_name', 'likes_count', 'annotated_likes', 'rating'], rows[0])
+        self.assertEqual([[str(self.book_2.id), 'Yeldana, "quoted" book', '1000.50', 'Aizat Kenges', '0', '0', '']],
+                         rows[1:])
+
+    def test_queries(self):
+        Book.objects.bulk_create(Book(name=f'Book {i}', price=10, autor_name='Author') for i in range(50))
+        response = self.client.get(reverse('book-export', args=('ndjson',)))
+        # one query however many books
+        with self.assertNumQueries(1):
+            content = self.get_content(response)
+        self.assertEqual(52, len(content.splitlines()))
+
+    def test_unknown_format(self):
+        response = self.client.get('/book/export/xml/')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
@@ -0,0 +1,117 @@
+import os
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.importer import BookImporter, iter_rows
+from store.models import Book
+
+CSV = (
+    'name,price,autor_name\n'
+    'Python 3,3500.00,Azat Yaakov\n'
+    '"Quoted, name",10,Aizat Kenges\n'
+    'No price,,Yeldana Kenges\n'
+    'Too expensive,123456789,Yeldana Kenges\n'
+)
+JSONL = (
+    '{"name": "Python 3", "price": 3500, "autor_name": "Azat Yaakov"}\n'
+    '\n'
+    'not json\n'
+    '{"name": "No author", "price": "12.50"}\n'
+    '{"name": "Django", "price": "12.50", "autor_name": "Alikhan Serikuly", "extra": 1}\n'
+)
+
+
+class BookImporterTestCase(TestCase):
+
+    def test_csv(self):
+        report = BookImporter(batch_size=1).run(iter_rows(BytesIO(CSV.encode()), 'csv'))
+        self.assertEqual(2, report['created'])
+        self.assertEqual([4, 5], [error['line'] for error in report['errors']])
+        self.assertEqual({'price'}, set(report['errors'][0]['errors']))
+        self.assertEqual(['Python 3', 'Quoted, name'], list(Book.objects.order_by('id').values_list('name', flat=True)))
+
+    def test_jsonl(self):
+        report = BookImporter().run(iter_rows(BytesIO(JSONL.encode()), 'jsonl'))
+        self.assertEqual((2, 2), (report['created'], report['error_count']))
+        self.assertEqual([(3, {'non_field_errors': ['Invalid row.']}), (4, {'autor_name': ['This field is required.']})],
+                         [(error['line'], error['errors']) for error in report['errors']])
+
+    def test_bad_bytes(self):
+        data = b'\xef\xbb\xbfname,price,autor_name\nPython 3,10,Caf\xe9\n"Two\nlines \xff",10,A\nDjango,12,B\n'
+        report = BookImporter().run(iter_rows(BytesIO(data), 'csv'))
+        self.assertEqual(1, report['created'])
+        self.assertEqual([2, 4], [error['line'] for error in report['errors']])
+        self.assertIn('UTF-8', report['errors'][0]['errors']['non_field_errors'][0])
+
+        data = b'{"name": "Caf\xe9", "price": 1, "autor_name": "A"}\n{"name": "Ok", "price": 1, "autor_name": "A"}\n'
+        report = BookImporter().run(iter_rows(BytesIO(data), 'jsonl'))
+        self.assertEqual((1, [1]), (report['created'], [error['line'] for error in report['errors']]))
+
+    def test_csv_field_too_large(self):
+        data = f'name,price,autor_name\n{"x" * 200000},10,A\nDjango,12,B\n'.encode()
+        report = BookImporter().run(iter_rows(BytesIO(data), 'csv'))
+        self.assertEqual(1, report['created'])
+        self.assertEqual([2], [error['line'] for error in report['errors']])
+        self.assertIn('Invalid CSV', report['errors'][0]['errors']['non_field_errors'][0])
+
+    def test_command(self):
+        user = User.objects.create(username='publisher')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(CSV)
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_books', file.name, owner='publisher', batch_size=1, stdout=out, stderr=err)
+        self.assertIn('Imported 2 books, 2 rows rejected', out.getvalue())
+        self.assertIn('line 4:', err.getvalue())
+        self.assertEqual(2, Book.objects.filter(owner=user).count())
+
+
+class BookImportApiTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.url = reverse('book-import')
+
+    def test_upload(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('feed.csv', CSV.encode(), content_type='text/csv')
+        # spooled to a temporary file like a large feed
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0):
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual((2, 2), (response.data['created'], response.data['error_count']))
+        self.assertEqual(2, Book.objects.filter(owner=self.user).count())
+        # the list cache was invalidated
+        self.assertEqual(2, len(self.client.get(reverse('book-list')).data['results']))
+
+    def test_upload_format(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('feed', JSONL.encode())
+        response = self.client.post(self.url, {'file': upload, 'format': 'jsonl'}, format='multipart')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(2, response.data['created'])
+
+        upload = SimpleUploadedFile('feed', JSONL.encode())
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_upload_invalid(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('feed.jsonl', b'not json\n')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(0, response.data['created'])
+
+    def test_anonymous(self):
+        upload = SimpleUploadedFile('feed.csv', CSV.encode())
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+        self.assertEqual(0, Book.objects.count())
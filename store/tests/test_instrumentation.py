@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.instrumentation import InstrumentationMiddleware, RequestMetrics, _metrics, count_connect, pool_stats
+from store.models import Book
+
+
+class InstrumentationMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges')
+        self.book_2 = Book.objects.create(name='Yeldana book', price=1515.00, autor_name='Aizat Kenges')
+
+    def get_timings(self, response):
+        timings = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        return timings
+
+    def test_server_timing(self):
+        with self.assertLogs('store.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('book-detail', args=(self.book_1.id,)))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        timings = self.get_timings(response)
+        self.assertEqual(['db', 'serialize', 'render', 'total'], list(timings))
+        # last modified stamp, the book
+        self.assertEqual('"2 queries"', timings['db']['desc'])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(('GET', 200, 2, 0), (record['method'], record['status'], record['queries'],
+                                              record['repeated_queries']))
+        # the test database connection is open already, SQLite is not pooled
+        self.assertEqual(0, record['connects'])
+        self.assertNotIn('pool', record)
+
+    def test_list_values(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual({'db', 'serialize', 'render', 'total'}, set(self.get_timings(response)))
+
+    def test_relation(self):
+        self.client.force_login(self.user)
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        response = self.client.patch(url, data=json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn('db', self.get_timings(response))
+
+
+class RepeatedQueriesTestCase(TestCase):
+
+    @override_settings(BOOKS_REPEATED_QUERY_THRESHOLD=3)
+    def test_repeated(self):
+        books = [Book.objects.create(name=f'Book {i}', price=10, autor_name='Author') for i in range(3)]
+
+        def n_plus_one(request):
+            for book in books:
+                list(Book.objects.filter(id=book.id))
+            list(Book.objects.filter(id__in=[book.id for book in books[:2]]))
+            list(Book.objects.filter(id__in=[book.id for book in books]))
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(n_plus_one)
+        with self.assertLogs('store.instrumentation', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/book/'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"5 queries"', response['Server-Timing'])
+        self.assertEqual(1, len(logs.records))
+        self.assertIn('Repeated queries on GET /book/', logs.output[0])
+
+
+class PoolStatsTestCase(TestCase):
+
+    def test_direct(self):
+        self.assertEqual({'mode': 'direct', 'connected': True}, pool_stats())
+
+    def test_count_connect(self):
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            count_connect(None, SimpleNamespace())
+            # a checkout from a pool is no new connection
+            count_connect(None, SimpleNamespace(pool=object()))
+        finally:
+            _metrics.reset(token)
+        self.assertEqual(1, metrics.connects)
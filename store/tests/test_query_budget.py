@@ -0,0 +1,82 @@
+import json
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.cache import get_cache
+from store.models import Book, UserBookRelation
+from store.tests.budget import QueryBudgetMixin
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # enough books and relations that a query per book or relation stands out
+        cls.users = [User.objects.create(username=f'reader_{i}') for i in range(5)]
+        cls.user = cls.users[0]
+        cls.books = Book.objects.bulk_create(
+            Book(name=f'Python book {i}', price=100 + i % 7, autor_name=f'Author {i % 4}', owner=cls.user)
+            for i in range(60)
+        )
+        for book in cls.books:
+            for i, user in enumerate(cls.users):
+                UserBookRelation.objects.create(user=user, book=book, like=(book.id + i) % 2 == 0,
+                                                in_bookmarks=i % 2 == 0, rate=(book.id + i) % 5 + 1)
+
+    def setUp(self):
+        # every request has to reach the database
+        get_cache().clear()
+
+    def get_list(self, page_size, **params):
+        return self.client.get(reverse('book-list'), data={'page_size': page_size, **params})
+
+    def test_list(self):
+        # last modified stamp, page, total (cached after the first page size)
+        self.assertPageBudget(3, 0, self.get_list)
+
+    def test_list_filter_search_ordering(self):
+        # 8 books per price
+        self.assertPageBudget(3, 0, lambda page_size: self.get_list(page_size, price=103), page_sizes=(1, 8))
+        self.assertPageBudget(3, 0, lambda page_size: self.get_list(page_size, search='Python'))
+        self.assertPageBudget(3, 0, lambda page_size: self.get_list(page_size, ordering='-price'))
+        self.assertPageBudget(3, 0, lambda page_size: self.get_list(page_size, search='book',
+                                                                    ordering='autor_name'))
+
+    def test_list_next_page(self):
+        next_page = self.get_list(10, ordering='price').data['next']
+        self.assertPageBudget(3, 0, lambda page_size: self.client.get(next_page, data={'page_size': page_size}))
+
+    def test_list_authenticated(self):
+        self.client.force_login(self.user)
+        # session, user, last modified stamp, page with own relations, total
+        self.assertPageBudget(5, 0, self.get_list)
+
+    def test_my_bookmarks(self):
+        self.client.force_login(self.user)
+        url = reverse('my-bookmarks-list')
+        self.assertPageBudget(4, 0, lambda page_size: self.client.get(url, data={'page_size': page_size}))
+
+    def test_retrieve(self):
+        url = reverse('book-detail', args=(self.books[0].id,))
+        response = self.assertQueryBudget(2, self.client.get, url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_create(self):
+        self.client.force_login(self.user)
+        data = json.dumps({'name': 'Python 3', 'price': '3500.00', 'autor_name': 'Azat Yaakov'})
+        # session, user, insert
+        response = self.assertQueryBudget(3, self.client.post, reverse('book-list'), data=data,
+                                          content_type='application/json')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+
+    def test_relation_patch(self):
+        self.client.force_login(self.users[1])
+        url = reverse('userbookrelation-detail', args=(self.books[0].id,))
+        data = json.dumps({'like': True, 'rate': 2})
+        # session, user, savepoint, locked old state, upsert, counters, release
+        response = self.assertQueryBudget(7, self.client.patch, url, data=data,
+                                          content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
@@ -0,0 +1,92 @@
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.models import Book, BookSimilarity, UserBookRelation
+from store.recommendations import build_similarities, np
+
+
+class SimilarBooksApiTestCase(APITestCase):
+
+    def setUp(self):
+        self.book_1 = Book.objects.create(name='Test book 1', price=25, autor_name='Author 1')
+        self.book_2 = Book.objects.create(name='Test book 2', price=55, autor_name='Author 2')
+        self.book_3 = Book.objects.create(name='Test book 3', price=35, autor_name='Author 3')
+        BookSimilarity.objects.create(book=self.book_1, similar=self.book_2, score=0.4, common=2)
+        BookSimilarity.objects.create(book=self.book_1, similar=self.book_3, score=0.9, common=5)
+
+    def test_similar(self):
+        url = reverse('book-similar', args=(self.book_1.id,))
+        response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([self.book_3.id, self.book_2.id], [book['id'] for book in response.data])
+
+        response = self.client.get(url, data={'limit': 1})
+        self.assertEqual([self.book_3.id], [book['id'] for book in response.data])
+
+    def test_no_neighbours(self):
+        response = self.client.get(reverse('book-similar', args=(self.book_2.id,)))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([], response.data)
+
+    def test_not_found(self):
+        response = self.client.get(reverse('book-similar', args=(self.book_3.id + 100,)))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+@skipIf(np is None, 'numpy and scipy are not installed')
+class BuildSimilaritiesTestCase(TestCase):
+
+    def setUp(self):
+        self.books = [Book.objects.create(name=f'Book {i}', price=10, autor_name='Author') for i in range(4)]
+        self.users = [User.objects.create(username=f'user_{i}') for i in range(3)]
+        # books 0 and 1 are liked together by everyone, book 2 by one of them
+        for user in self.users:
+            self.like(user, self.books[0])
+            self.like(user, self.books[1])
+        UserBookRelation.objects.create(user=self.users[0], book=self.books[2], rate=5)
+
+    def like(self, user, book):
+        UserBookRelation.objects.create(user=user, book=book, like=True)
+
+    def neighbours(self, book):
+        return list(BookSimilarity.objects.filter(book=book).order_by('-score')
+                    .values_list('similar_id', 'common'))
+
+    def test_build(self):
+        self.assertEqual(3, build_similarities(min_common=1))
+        self.assertEqual([(self.books[1].id, 3), (self.books[2].id, 1)], self.neighbours(self.books[0]))
+        similarity = BookSimilarity.objects.get(book=self.books[0], similar=self.books[1])
+        self.assertAlmostEqual(1.0, similarity.score, places=5)
+        self.assertEqual([], self.neighbours(self.books[3]))
+
+    def test_min_common_and_top_k(self):
+        build_similarities(top_k=1, min_common=2)
+        self.assertEqual([(self.books[1].id, 3)], self.neighbours(self.books[0]))
+        self.assertEqual([], self.neighbours(self.books[2]))
+
+    def test_incremental(self):
+        build_similarities(min_common=1)
+        self.like(self.users[1], self.books[3])
+        self.like(self.users[2], self.books[3])
+        # book 3 and the books sharing its readers
+        self.assertEqual(3, build_similarities([self.books[3].id], min_common=2))
+        self.assertEqual([(self.books[0].id, 2), (self.books[1].id, 2)],
+                         sorted(self.neighbours(self.books[3])))
+        # not co-read with book 3, left as built
+        self.assertEqual([(self.books[0].id, 1), (self.books[1].id, 1)],
+                         sorted(self.neighbours(self.books[2])))
+
+    def test_incremental_lost_readers(self):
+        build_similarities(min_common=1)
+        self.assertIn((self.books[2].id, 1), self.neighbours(self.books[0]))
+        UserBookRelation.objects.filter(book=self.books[2]).update(rate=None)
+        build_similarities([self.books[2].id], min_common=1)
+        # same as a full build
+        self.assertEqual([(self.books[1].id, 3)], self.neighbours(self.books[0]))
+        self.assertEqual([], self.neighbours(self.books[2]))
+        self.assertFalse(BookSimilarity.objects.filter(score__gt=1.0).exists())
@@ -0,0 +1,61 @@
+import json
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from store import renderers
+from store.models import Book, UserBookRelation
+from store.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTestCase(APITestCase):
+
+    def test_same_output(self):
+        data = {'id': 1, 'name': 'Книга\u2028 1', 'price': Decimal('1515.00'), 'rating': None,
+                'items': [1.5, True, {'nested': 'Yeldana Kenges'}]}
+        self.assertEqual(JSONRenderer().render(data), FastJSONRenderer().render(data))
+        self.assertEqual(JSONRenderer().render(data, 'application/json; indent=2'),
+                         FastJSONRenderer().render(data, 'application/json; indent=2'))
+        self.assertEqual(JSONRenderer().render(data, 'application/json; indent=4'),
+                         FastJSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_without_orjson(self):
+        data = {'price': Decimal('1515.00')}
+        orjson, renderers.orjson = renderers.orjson, None
+        try:
+            self.assertEqual(JSONRenderer().render(data), FastJSONRenderer().render(data))
+        finally:
+            renderers.orjson = orjson
+
+
+@skipIf(renderers.msgpack is None, 'msgpack is not installed')
+class MessagePackTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges',
+                                          owner=self.user)
+
+    def test_get(self):
+        url = reverse('book-list')
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('application/msgpack', response['Content-Type'])
+        data = renderers.msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(json.loads(self.client.get(url, {'ordering': 'id'}).content)['results'],
+                         data['results'])
+
+    def test_patch(self):
+        url = reverse('userbookrelation-detail', args=(self.book_1.id,))
+        self.client.force_login(self.user)
+        response = self.client.patch(url, data=renderers.msgpack.packb({'like': True, 'rate': 4}),
+                                     content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': False, 'rate': 4},
+                         renderers.msgpack.unpackb(response.content))
+        self.assertTrue(UserBookRelation.objects.get(user=self.user, book=self.book_1).like)
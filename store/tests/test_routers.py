@@ -0,0 +1,90 @@
+import json
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from store.models import Book
+from store.routers import PIN_COOKIE, ReplicaRouter, pin_to_primary
+
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@override_settings(BOOKS_READ_REPLICAS=['replica'])
+class ReplicaRouterTestCase(SimpleTestCase):
+
+    def test_routing(self):
+        router = ReplicaRouter()
+        self.assertEqual('replica', router.db_for_read(Book))
+        self.assertEqual('default', router.db_for_write(Book))
+        # only catalogue models are read from replicas
+        self.assertIsNone(router.db_for_read(User))
+        with pin_to_primary():
+            self.assertEqual('default', router.db_for_read(Book))
+        self.assertEqual('replica', router.db_for_read(Book))
+
+    @override_settings(BOOKS_READ_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Book))
+
+
+class ReplicaPinningTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges')
+
+    def test_cookie(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('book-list'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        url = reverse('userbookrelation-detail', args=(self.book.id,))
+        response = self.client.patch(url, data=json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(10, cookie['max-age'])
+        self.assertGreater(float(cookie.value), time.time())
+
+        # failed writes do not pin
+        self.client.cookies.pop(PIN_COOKIE)
+        response = self.client.patch(reverse('userbookrelation-detail', args=(0,)),
+                                     data=json.dumps({'like': True}), content_type='application/json')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@skipUnless(HAS_REPLICA, 'needs a second database alias standing in for a replica')
+@override_settings(BOOKS_READ_REPLICAS=['replica'])
+class ReplicaReadYourWritesTestCase(APITransactionTestCase):
+    # the replica is a separate empty database, nothing is replicated to it
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def get_ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [book['id'] for book in json.loads(response.content)['results']]
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.book = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges')
+
+    def test_read_your_writes(self):
+        url = reverse('book-list')
+        self.assertEqual([], self.get_ids(url))
+
+        self.client.force_login(self.user)
+        response = self.client.patch(reverse('userbookrelation-detail', args=(self.book.id,)),
+                                     data=json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        # pinned to the primary, sees the book and the own like
+        results = json.loads(self.client.get(url).content)['results']
+        self.assertEqual([(self.book.id, True)], [(book['id'], book['my_like']) for book in results])
+
+        # pin expired, the cached primary page is not reused
+        self.client.cookies[PIN_COOKIE] = str(time.time() - 1)
+        self.assertEqual([], self.get_ids(url))
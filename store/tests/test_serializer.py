@@ -2,10 +2,11 @@ from django.db.models import Count, Case, When, Avg
 from django.test import TestCase
 
 from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
 
 from store.models import Book
 from store.models import Book, UserBookRelation
-from store.serializers import BooksSerializer
+from store.serializers import BooksSerializer, BookValuesSerializer
 
 
 class BookSerializerTestCase(TestCase):
@@ -59,3 +60,42 @@ class BookSerializerTestCase(TestCase):
             },
         ]
         self.assertEqual(expected_data, data)
+
+    def test_likes_count_queries(self):
+        users = [User.objects.create(username=f'user{i}') for i in range(3)]
+        books = [Book.objects.create(name=f'Test book {i}', price=1000, autor_name='Yeldana Kenges')
+                 for i in range(5)]
+        for user in users:
+            for book in books[:3]:
+                UserBookRelation.objects.create(user=user, book=book, like=True)
+        # bare Book objects: one grouped query for the page
+        with self.assertNumQueries(1):
+            data = BooksSerializer(books, many=True).data
+        self.assertEqual([3, 3, 3, 0, 0], [book['likes_count'] for book in data])
+        # annotated queryset: no extra queries
+        annotated = Book.objects.all().annotate(
+            annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))),
+            rating=Avg('userbookrelation__rate')
+        ).order_by('id')
+        with self.assertNumQueries(1):
+            data = BooksSerializer(annotated, many=True).data
+        self.assertEqual([3, 3, 3, 0, 0], [book['likes_count'] for book in data])
+        # single object fallback
+        with self.assertNumQueries(1):
+            self.assertEqual(3, BooksSerializer(books[0]).data['likes_count'])
+
+    def test_values(self):
+        user1 = User.objects.create(username='user1')
+        user2 = User.objects.create(username='user2')
+        book_1 = Book.objects.create(name='Test book 1', price=1515, autor_name='Yeldana Kenges')
+        Book.objects.create(name='Test book 2', price=2000.5, autor_name='Aizat Kenges')
+        UserBookRelation.objects.create(user=user1, book=book_1, like=True, rate=5)
+        UserBookRelation.objects.create(user=user2, book=book_1, like=True, rate=4)
+        books = Book.objects.all().annotate(
+            annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))),
+            rating=Avg('userbookrelation__rate')
+        ).order_by('id')
+        values_serializer = BookValuesSerializer()
+        data = values_serializer.to_representation(books.values_list(*values_serializer.columns))
+        self.assertEqual(JSONRenderer().render(BooksSerializer(books, many=True).data),
+                         JSONRenderer().render(data))
@@ -0,0 +1,107 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from store.cache import get_catalogue_version
+from store.models import Book, PendingRelationWrite, UserBookRelation
+from store.relations import flush_relation_writes
+
+
+@override_settings(BOOKS_RELATION_WRITE_BEHIND=True)
+class WriteBehindTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_username')
+        self.user2 = User.objects.create(username='test_username2')
+        self.book_1 = Book.objects.create(name='Test book 1', price=1515.00, autor_name='Yeldana Kenges')
+        self.book_2 = Book.objects.create(name='Test book 2', price=1000.00, autor_name='Aizat Kenges')
+        UserBookRelation.objects.create(user=self.user, book=self.book_1, in_bookmarks=True, rate=3)
+
+    def patch(self, book, data, user=None):
+        self.client.force_login(user or self.user)
+        url = reverse('userbookrelation-detail', args=(book.id,))
+        return self.client.patch(url, data=json.dumps(data), content_type='application/json')
+
+    def test_queue(self):
+        response = self.patch(self.book_1, {'like': True})
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertEqual({'book': self.book_1.id, 'like': True, 'in_bookmarks': True, 'rate': 3}, response.data)
+        # not applied yet, the book row was not touched
+        self.assertFalse(UserBookRelation.objects.get(user=self.user, book=self.book_1).like)
+        self.book_1.refresh_from_db()
+        self.assertEqual(0, self.book_1.likes_count)
+
+        # toggles coalesce into one pending row
+        self.patch(self.book_1, {'like': False})
+        self.patch(self.book_1, {'like': True, 'rate': None})
+        self.patch(self.book_2, {'in_bookmarks': True})
+        self.assertEqual(2, PendingRelationWrite.objects.count())
+
+        # own state with the pending changes merged in
+        response = self.client.get(reverse('book-list'))
+        my_relations = [(book['my_like'], book['my_bookmark'], book['my_rate'])
+                        for book in response.data['results']]
+        self.assertEqual([(True, True, None), (False, True, None)], my_relations)
+
+    def test_queue_invalidates_own_pages(self):
+        url = reverse('book-list')
+        anonymous = self.client.get(url).content
+        self.client.force_login(self.user)
+        etag = self.client.get(url)['ETag']
+        version = get_catalogue_version()
+
+        self.patch(self.book_2, {'like': True})
+        # other readers keep their cached pages
+        self.assertEqual(version, get_catalogue_version())
+        self.client.logout()
+        with self.assertNumQueries(1):
+            self.assertEqual(anonymous, self.client.get(url).content)
+
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(json.loads(response.content)['results'][1]['my_like'])
+
+        # flushing moves the counters and invalidates everybody's pages
+        flush_relation_writes()
+        self.assertNotEqual(version, get_catalogue_version())
+
+    def test_flush(self):
+        self.patch(self.book_1, {'like': True})
+        self.patch(self.book_1, {'rate': 5})
+        self.patch(self.book_2, {'like': True})
+        self.patch(self.book_2, {'like': True, 'rate': 4}, user=self.user2)
+
+        self.assertEqual(2, flush_relation_writes(batch_size=2))
+        self.assertEqual(1, flush_relation_writes())
+        self.assertEqual(0, flush_relation_writes())
+        self.assertFalse(PendingRelationWrite.objects.exists())
+
+        relation = UserBookRelation.objects.get(user=self.user, book=self.book_1)
+        self.assertEqual((True, True, 5), (relation.like, relation.in_bookmarks, relation.rate))
+        self.book_1.refresh_from_db()
+        self.book_2.refresh_from_db()
+        self.assertEqual((1, 5, 1), (self.book_1.likes_count, self.book_1.rating_sum, self.book_1.rating_count))
+        self.assertEqual((2, 4, 1), (self.book_2.likes_count, self.book_2.rating_sum, self.book_2.rating_count))
+
+    def test_flush_command(self):
+        self.patch(self.book_2, {'like': True})
+        self.patch(self.book_2, {'like': True}, user=self.user2)
+        out = StringIO()
+        call_command('flush_relation_writes', batch_size=1, stdout=out)
+        self.assertIn('Flushed 2 relation changes', out.getvalue())
+        self.book_2.refresh_from_db()
+        self.assertEqual(2, self.book_2.likes_count)
+
+    def test_unknown_book(self):
+        self.client.force_login(self.user)
+        url = reverse('userbookrelation-detail', args=(0,))
+        response = self.client.patch(url, data=json.dumps({'like': True}), content_type='application/json')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertFalse(PendingRelationWrite.objects.exists())
@@ -1,38 +1,221 @@
-from django.db.models import Count, Case, When, Avg
+from django.db.models import Case, When, F, FilteredRelation, FloatField, Q, Subquery
+from django.db.models.functions import Cast, Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.mixins import UpdateModelMixin
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.mixins import ListModelMixin, UpdateModelMixin
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
 from books.store.permissions import IsOwnerOrStaffOrReadOnly
-from .models import Book, UserBookRelation
-from .serializers import BooksSerializer, UserBookRelationSerializer
+from .cache import ConditionalGetMixin
+from .export import EXPORT_CONTENT_TYPES, export_lines
+from .filters import BookOrderingFilter
+from .importer import IMPORT_FORMATS, BookImporter, guess_format, iter_rows
+from .mixins import ValuesListModelMixin
+from .models import Book, PendingRelationWrite, UserBookRelation
+from .pagination import KeysetPagination
+from .relations import RELATION_FIELDS, bulk_upsert_relations, queue_relation, upsert_relation, \
+    write_behind_enabled
+from .search import BookSearchFilter
+from .serializers import BooksSerializer, BookValuesSerializer, UserBookRelationSerializer
 
 
-class BookViewSet(ModelViewSet):
-    queryset = Book.objects.all().annotate(
-            annotated_likes=Count(Case(When(userbookrelation__like=True, then=1))),
-            # rating
-            rating=Avg('userbookrelation__rate')
-        ).order_by('id')
+def annotate_counters(queryset):
+    """
+    read denormalized counters instead of aggregating UserBookRelation
+    :return: queryset with annotated_likes and rating
+    """
+    return queryset.annotate(
+        annotated_likes=F('likes_count'),
+        # rating
+        rating=Case(When(rating_count=0, then=None),
+                    default=Cast('rating_sum', FloatField()) / F('rating_count'),
+                    output_field=FloatField())
+    )
+
+
+class BookViewSet(ConditionalGetMixin, ValuesListModelMixin, ModelViewSet):
+    queryset = annotate_counters(Book.objects.all()).order_by('id')
     serializer_class = BooksSerializer
+    # list without model instances
+    values_serializer_class = BookValuesSerializer
     # OAuth all users can read
     # permission_classes = [IsAuthenticatedOrReadOnly]
     # add permission
     permission_classes = [IsOwnerOrStaffOrReadOnly]
     # second lesson filtering
     # add search
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, BookOrderingFilter]
     filterset_fields = ['price']
     search_fields = ['name', 'autor_name']
-    ordering_fields = ['price', 'autor_name']
+    # rating/likes are aliases of the indexed ranking columns, see BookOrderingFilter
+    ordering_fields = ['price', 'autor_name', 'rating', 'weighted_rating', 'likes', 'annotated_likes']
+    # keyset pages on (ordering, id)
+    pagination_class = KeysetPagination
+    cached_actions = ('list', 'retrieve', 'top', 'similar')
+    # /book/top/?by=...
+    top_columns = {'weighted_rating': 'rating_weighted', 'rating': 'rating_avg', 'likes': 'likes_count'}
+    top_default_limit = 20
+    top_max_limit = 100
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user and user.is_authenticated:
+            # own like/bookmark/rate in the same query, (user, book) is unique
+            queryset = queryset.annotate(
+                my_relation=FilteredRelation('userbookrelation', condition=Q(userbookrelation__user=user)),
+                my_like=Coalesce(F('my_relation__like'), False),
+                my_bookmark=Coalesce(F('my_relation__in_bookmarks'), False),
+                my_rate=F('my_relation__rate'),
+            )
+            if write_behind_enabled():
+                # not yet flushed changes win, users see their own toggles
+                queryset = queryset.annotate(
+                    my_pending=FilteredRelation('pending_writes', condition=Q(pending_writes__user=user)),
+                    my_like=Coalesce(F('my_pending__like'), F('my_relation__like'), False),
+                    my_bookmark=Coalesce(F('my_pending__in_bookmarks'), F('my_relation__in_bookmarks'), False),
+                    my_rate=Case(When(my_pending__rate_set=True, then=F('my_pending__rate')),
+                                 default=F('my_relation__rate')),
+                )
+        return queryset
+
+    def get_stamp_subqueries(self, request):
+        subqueries = super().get_stamp_subqueries(request)
+        user = request.user
+        if user and user.is_authenticated and write_behind_enabled():
+            # a queued toggle changes the user's my_* before any book is touched
+            pending = PendingRelationWrite.objects.filter(user=user).order_by('-updated_at')
+            subqueries['pending_at'] = Subquery(pending.values('updated_at')[:1])
+        return subqueries
 
 # permissions
     def perform_create(self, serializer):
         serializer.validated_data['owner'] = self.request.user
-        serializer.save()
+        book = serializer.save()
+        # no readers yet, likes_count from the counter instead of a query
+        book.annotated_likes = book.likes_count
+
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        """
+        ?by=weighted_rating (default), rating or likes, ?limit= up to top_max_limit
+        :return: top books, a range scan of the ranking index
+        """
+        return self.cached_response(self.get_top, request)
+
+    def get_top(self, request):
+        column = self.top_columns.get(request.query_params.get('by', 'weighted_rating'))
+        if column is None:
+            raise ValidationError({'by': [f'Expected one of {", ".join(self.top_columns)}.']})
+        try:
+            limit = int(request.query_params.get('limit', self.top_default_limit))
+        except ValueError:
+            limit = self.top_default_limit
+        limit = min(max(limit, 1), self.top_max_limit)
+        values_serializer = self.get_values_serializer()
+        rows = self.get_queryset().order_by(f'-{column}', 'id').values_list(*values_serializer.columns)[:limit]
+        return Response(values_serializer.to_representation(rows))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        "readers who liked this also liked", precomputed by build_recommendations
+        :return: up to top_max_limit neighbours, most similar first
+        """
+        return self.cached_response(self.get_similar, request, pk=pk)
+
+    def get_similar(self, request, pk=None):
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        try:
+            limit = int(request.query_params.get('limit', self.top_default_limit))
+        except ValueError:
+            limit = self.top_default_limit
+        limit = min(max(limit, 1), self.top_max_limit)
+        values_serializer = self.get_values_serializer()
+        # one range of the (book, -score) index joined to the neighbours
+        rows = self.get_queryset().filter(similar_to__book=book_id) \
+            .order_by('-similar_to__score', 'id').values_list(*values_serializer.columns)[:limit]
+        results = values_serializer.to_representation(rows)
+        if not results and not Book.objects.filter(pk=book_id).exists():
+            raise NotFound()
+        return Response(results)
+
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|ndjson)', url_name='export')
+    def export(self, request, export_format):
+        """
+        whole catalogue (filters apply) as CSV or NDJSON with the list fields,
+        streamed from a server-side cursor
+        """
+        values_serializer = BookValuesSerializer()
+        queryset = self.filter_queryset(self.queryset.all())
+        rows = queryset.values_list(*values_serializer.columns).iterator(chunk_size=self.export_chunk_size)
+        fields = [name for name, _, _ in values_serializer.output]
+        response = StreamingHttpResponse(
+            export_lines(values_serializer.iter_representation(rows), fields, export_format),
+            content_type=EXPORT_CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', url_name='import',
+            permission_classes=[IsAuthenticated], parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        """
+        multipart `file` with CSV (name,price,autor_name header) or JSON lines,
+        `format` when the file name has no .csv/.jsonl extension
+        :return: created count and per-line errors
+        """
+        upload = request.data.get('file')
+        if upload is None or not hasattr(upload, 'read'):
+            raise ValidationError({'file': ['No file was submitted.']})
+        format = request.data.get('format') or guess_format(upload.name)
+        if format not in IMPORT_FORMATS:
+            raise ValidationError({'format': [f'Expected one of {", ".join(IMPORT_FORMATS)}.']})
+        # large uploads are spooled to a temporary file and parsed line by line
+        report = BookImporter(owner=request.user).run(iter_rows(upload.file, format))
+        code = status.HTTP_201_CREATED if report['created'] or not report['error_count'] \
+            else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=code)
+
+
+class MyBooksViewSet(ValuesListModelMixin, ListModelMixin, GenericViewSet):
+    """
+    Books the current user marked with `relation_field`, newest relation first.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = BooksSerializer
+    values_serializer_class = BookValuesSerializer
+    pagination_class = KeysetPagination
+    relation_field = None
+
+    def get_queryset(self):
+        # one join, walks the partial (user, id) index of relation_field backwards
+        queryset = self.request.user.books.filter(**{f'userbookrelation__{self.relation_field}': True})
+        return annotate_counters(queryset).annotate(
+            relation_id=F('userbookrelation__id'),
+            my_like=F('userbookrelation__like'),
+            my_bookmark=F('userbookrelation__in_bookmarks'),
+            my_rate=F('userbookrelation__rate'),
+        ).order_by('-relation_id')
+
+
+class MyBookmarksViewSet(MyBooksViewSet):
+    relation_field = 'in_bookmarks'
+
+
+class MyLikesViewSet(MyBooksViewSet):
+    relation_field = 'like'
 
 
 class UserBookRelationView(UpdateModelMixin, GenericViewSet):
@@ -41,11 +224,49 @@ class UserBookRelationView(UpdateModelMixin, GenericViewSet):
     serializer_class = UserBookRelationSerializer
     # чисто для удобства
     lookup_field = 'book'
+    bulk_max_items = 1000
+
+    def update(self, request, *args, **kwargs):
+        # one upsert instead of get_or_create + save
+        partial = kwargs.pop('partial', False)
+        serializer = self.get_serializer(data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        values = {field: value for field, value in serializer.validated_data.items()
+                  if field in RELATION_FIELDS}
+        write_behind = write_behind_enabled()
+        try:
+            book_id = int(self.kwargs['book'])
+            if write_behind:
+                # acknowledged now, flush_relation_writes applies it
+                relation = queue_relation(request.user, book_id, values)
+            else:
+                relation = upsert_relation(request.user, book_id, values)
+        except (ValueError, Book.DoesNotExist):
+            raise NotFound()
+        code = status.HTTP_202_ACCEPTED if write_behind else status.HTTP_200_OK
+        return Response(self.get_serializer(relation).data, status=code)
 
-    def get_object(self):
-        obj, _ = UserBookRelation.objects.get_or_create(user=self.request.user,
-                                                        book_id=self.kwargs['book'])
-        return obj
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        [{"book": 1, "like": true}, {"book": 2, "rate": 5}, ...] in one transaction
+        :return: stored relation for every item
+        """
+        if not isinstance(request.data, list) or len(request.data) > self.bulk_max_items:
+            raise ValidationError(f'Expected a list of at most {self.bulk_max_items} items.')
+        book_ids = set()
+        for item in request.data:
+            try:
+                book_ids.add(int(item['book']))
+            except (TypeError, ValueError, KeyError):
+                pass
+        context = self.get_serializer_context()
+        context['books'] = Book.objects.in_bulk(book_ids)
+        serializer = self.get_serializer(data=request.data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+        relations = bulk_upsert_relations(request.user, serializer.validated_data)
+        results = [relations[item['book'].pk] for item in serializer.validated_data]
+        return Response(self.get_serializer(results, many=True).data)
 
 # auth
 def auth(request):